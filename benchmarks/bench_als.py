@@ -0,0 +1,51 @@
+"""
+bench_als.py — Wall-clock of implicit ALS iterations vs the TruncatedSVD fit
+
+For each dataset size, fits MatrixFactorizationRecommender (TruncatedSVD) and
+ImplicitALSRecommender with the same number of factors and reports the SVD fit
+time next to the mean / max time of one ALS iteration (a user and an item
+half-step).
+
+Usage:
+    python benchmarks/bench_als.py --interactions 100000 1000000 5000000 --jobs 8
+"""
+
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.matrix_factorization import MatrixFactorizationRecommender
+from src.models.als import ImplicitALSRecommender
+from benchmarks.synthetic import make_interactions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interactions', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--factors', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    for n_interactions in args.interactions:
+        n_users, n_pins = max(n_interactions // 10, 100), max(n_interactions // 5, 100)
+        interactions = make_interactions(n_users, n_pins, n_interactions)
+
+        t0 = time.perf_counter()
+        MatrixFactorizationRecommender(n_factors=args.factors).fit(interactions)
+        svd_time = time.perf_counter() - t0
+
+        als = ImplicitALSRecommender(
+            n_factors=args.factors, n_iterations=args.iterations, n_jobs=args.jobs
+        ).fit(interactions)
+        per_iter = np.array(als.iteration_times_)
+
+        print(f"{n_interactions:,} interactions | {len(als.user_ids):,} users | {len(als.pin_ids):,} pins")
+        print(f"  SVD fit (n_iter=20):   {svd_time:8.2f}s")
+        print(f"  ALS per iteration:     {per_iter.mean():8.2f}s mean | {per_iter.max():.2f}s max "
+              f"| {args.iterations} iterations")
+
+
+if __name__ == '__main__':
+    main()
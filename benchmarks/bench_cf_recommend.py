@@ -0,0 +1,80 @@
+"""
+bench_cf_recommend.py — Per-request latency of CollaborativeFilteringRecommender.recommend
+
+Compares the original loop-based scoring path (full argsort over the similarity
+row, one densified user row per neighbor, full argsort over the catalog) against
+the vectorized path (one sparse product, CSR seen-masking, argpartition).
+
+Usage:
+    python benchmarks/bench_cf_recommend.py --users 5000 --pins 50000 --interactions 200000
+"""
+
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.collaborative_filtering import CollaborativeFilteringRecommender
+from benchmarks.synthetic import make_interactions
+
+
+def legacy_recommend(model, user_id, n=10, exclude_seen=True):
+    """The original per-neighbor loop, kept here as the baseline."""
+    if user_id not in model.user_index:
+        return []
+
+    u_idx = model.user_index[user_id]
+    sim_scores = model.user_similarity[u_idx]
+
+    top_users = np.argsort(sim_scores)[::-1][1:model.n_similar_users + 1]
+    scores = np.zeros(len(model.pin_ids))
+    for v_idx in top_users:
+        scores += sim_scores[v_idx] * model.user_item_matrix[v_idx].toarray().flatten()
+
+    if exclude_seen:
+        seen = model.user_item_matrix[u_idx].toarray().flatten()
+        scores[seen > 0] = 0
+
+    top_pins = np.argsort(scores)[::-1][:n]
+    return [model.pin_ids[i] for i in top_pins if scores[i] > 0]
+
+
+def time_requests(fn, user_ids):
+    latencies = []
+    for user_id in user_ids:
+        t0 = time.perf_counter()
+        fn(user_id)
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'mean_ms': round(float(latencies.mean()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--pins', type=int, default=50000)
+    parser.add_argument('--interactions', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    interactions = make_interactions(args.users, args.pins, args.interactions)
+    model = CollaborativeFilteringRecommender(n_similar_users=20).fit(interactions)
+
+    rng = np.random.default_rng(0)
+    user_ids = rng.choice(model.user_ids, min(args.requests, len(model.user_ids)), replace=False)
+
+    before = time_requests(lambda u: legacy_recommend(model, u), user_ids)
+    after = time_requests(lambda u: model.recommend(u), user_ids)
+
+    print(f"{len(model.user_ids):,} users | {len(model.pin_ids):,} pins | {len(user_ids)} requests")
+    print(f"  legacy loop:  p50 {before['p50_ms']:.3f} ms | p99 {before['p99_ms']:.3f} ms")
+    print(f"  vectorized:   p50 {after['p50_ms']:.3f} ms | p99 {after['p99_ms']:.3f} ms")
+    print(f"  speedup (p50): {before['p50_ms'] / after['p50_ms']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
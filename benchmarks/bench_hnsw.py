@@ -0,0 +1,67 @@
+"""
+bench_hnsw.py — HNSW index vs brute-force scoring over MF item factors
+
+For growing catalog sizes, indexes random unit-norm factor vectors (the shape of
+MatrixFactorizationRecommender.item_factors), then reports build time and
+per-query p50/p99 latency and recall@k for the graph search against exact
+brute-force scoring.
+
+Usage:
+    python benchmarks/bench_hnsw.py --items 10000 50000 200000 --ef 50 100
+"""
+
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.hnsw import HNSWIndex
+from src.utils.helpers import top_n_indices
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--factors', type=int, default=50)
+    parser.add_argument('--M', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--ef', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_items in args.items:
+        items = rng.standard_normal((n_items, args.factors)).astype(np.float32)
+        items /= np.linalg.norm(items, axis=1, keepdims=True)
+        queries = items[rng.choice(n_items, args.queries, replace=False)] + \
+            0.5 * rng.standard_normal((args.queries, args.factors)).astype(np.float32)
+
+        t0 = time.perf_counter()
+        index = HNSWIndex(args.factors, M=args.M, ef_construction=args.ef_construction)
+        index.add(items)
+        build = time.perf_counter() - t0
+
+        exact, brute = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            exact.append(set(top_n_indices(items @ q, args.k).tolist()))
+            brute.append(time.perf_counter() - t0)
+        brute = np.array(brute) * 1000
+        print(f"{n_items:,} items | build {build:.1f}s | brute force p50 {np.percentile(brute, 50):.2f} ms "
+              f"| p99 {np.percentile(brute, 99):.2f} ms")
+
+        for ef in args.ef:
+            latencies, recalls = [], []
+            for q, truth in zip(queries, exact):
+                t0 = time.perf_counter()
+                ids, _ = index.search(q, args.k, ef=ef)
+                latencies.append(time.perf_counter() - t0)
+                recalls.append(len(truth & set(ids.tolist())) / args.k)
+            latencies = np.array(latencies) * 1000
+            print(f"  ef={ef:<4} p50 {np.percentile(latencies, 50):6.2f} ms | p99 {np.percentile(latencies, 99):6.2f} ms "
+                  f"| recall@{args.k} {np.mean(recalls):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+bench_lsh.py — Recall/speed trade-off of the LSH user-neighbor backend
+
+Builds the exact top-k user graph once, then sweeps (lsh_tables,
+lsh_bucket_size, lsh_probes) settings and reports build time and recall@k of
+each approximate graph against the exact one, to pick a setting for
+CollaborativeFilteringRecommender(similarity='lsh'). The exact build is
+quadratic in users and LSH is linear, so compare at the target user count.
+
+Usage:
+    python benchmarks/bench_lsh.py --users 50000 --tables 8 16 24 --bucket-sizes 24 48 96 --probes 0 1 2
+"""
+
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.similarity import top_k_cosine_neighbors
+from src.models.lsh import lsh_cosine_neighbors, neighbor_recall
+from benchmarks.synthetic import make_interactions, to_user_item_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--interactions-per-user', type=int, default=10)
+    parser.add_argument('--pins-per-user', type=float, default=5.0)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--tables', type=int, nargs='+', default=[8, 16, 24])
+    parser.add_argument('--bucket-sizes', type=int, nargs='+', default=[24, 48, 96])
+    parser.add_argument('--probes', type=int, nargs='+', default=[0, 1, 2])
+    args = parser.parse_args()
+
+    interactions = make_interactions(
+        args.users, int(args.users * args.pins_per_user), args.users * args.interactions_per_user
+    )
+    matrix = to_user_item_matrix(interactions)
+    print(f"{matrix.shape[0]:,} users | {matrix.shape[1]:,} pins | {matrix.nnz:,} non-zeros | k={args.k}")
+
+    t0 = time.perf_counter()
+    exact = top_k_cosine_neighbors(matrix, args.k)
+    exact_time = time.perf_counter() - t0
+    print(f"  exact                                    {exact_time:8.2f}s | recall@{args.k} 1.000")
+
+    for n_tables in args.tables:
+        for bucket_size in args.bucket_sizes:
+            for n_probes in args.probes:
+                t0 = time.perf_counter()
+                approx = lsh_cosine_neighbors(
+                    matrix, args.k, n_tables=n_tables, n_probes=n_probes, bucket_size=bucket_size
+                )
+                elapsed = time.perf_counter() - t0
+                recall = neighbor_recall(approx, exact)
+                n_bits = max(1, int(round(np.log2(matrix.shape[0] / bucket_size))))
+                print(f"  tables={n_tables:<3} bucket={bucket_size:<4} (bits={n_bits:<2}) probes={n_probes:<2} "
+                      f"{elapsed:8.2f}s | recall@{args.k} {recall:.3f} | speedup {exact_time / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+bench_quantization.py — Int8 item factor store vs exact MF retrieval
+
+Fits MatrixFactorizationRecommender, then compares exact float32 scoring of
+the whole catalog against the int8 store (with and without exact re-ranking
+of the top candidates): item-store memory, per-request p50/p99 latency and
+recall@n of the quantized results against the exact top-n.
+
+Usage:
+    python benchmarks/bench_quantization.py --users 20000 --pins 500000 --interactions 1000000
+"""
+
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.matrix_factorization import MatrixFactorizationRecommender
+from src.models.quantization import QuantizedItemFactors
+from src.utils.helpers import top_n_indices
+from benchmarks.synthetic import make_interactions
+
+
+def timed(fn, queries):
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(fn(q))
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1000
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--pins', type=int, default=200000)
+    parser.add_argument('--interactions', type=int, default=500000)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--n', type=int, default=10)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[50, 200, 500])
+    args = parser.parse_args()
+
+    model = MatrixFactorizationRecommender(n_factors=50).fit(
+        make_interactions(args.users, args.pins, args.interactions)
+    )
+    items = model.item_factors
+    rng = np.random.default_rng(0)
+    queries = model.user_factors[rng.choice(len(model.user_ids), args.requests, replace=False)]
+
+    exact, p50, p99 = timed(lambda q: top_n_indices(items @ q, args.n), queries)
+    # Recall counts any result scoring at least the exact n-th score, so ties are not misses
+    thresholds = [float(items[top[-1]] @ q) - 1e-6 for top, q in zip(exact, queries)]
+    print(f"{len(model.pin_ids):,} pins | {items.shape[1]} factors | {args.requests} requests | n={args.n}")
+    print(f"  exact float32    {items.nbytes / 1e6:8.1f} MB (float64 {items.nbytes * 2 / 1e6:.1f} MB) "
+          f"| p50 {p50:6.2f} ms | p99 {p99:6.2f} ms | recall 1.000")
+
+    def report(label, store, n_candidates):
+        found, p50, p99 = timed(lambda q: store.search(q, args.n, n_candidates)[0], queries)
+        recall = np.mean([
+            np.count_nonzero(items[top] @ q >= t) / args.n for top, q, t in zip(found, queries, thresholds)
+        ])
+        print(f"  {label:<16} {store.nbytes / 1e6:8.1f} MB | p50 {p50:6.2f} ms | p99 {p99:6.2f} ms | recall {recall:.3f}")
+
+    report('int8 only', QuantizedItemFactors.from_factors(items), args.n)
+    for n_candidates in args.candidates:
+        store = QuantizedItemFactors.from_factors(items, exact=items)
+        report(f'int8 + rerank {n_candidates}', store, n_candidates)
+
+
+if __name__ == '__main__':
+    main()
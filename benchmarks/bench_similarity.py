@@ -0,0 +1,50 @@
+"""
+bench_similarity.py — Scaling of the blocked top-k user similarity engine
+
+Builds the sparse top-k neighbor graph used by
+CollaborativeFilteringRecommender(similarity='topk') at several user counts
+and worker counts, and reports wall time and speedup over one worker.
+
+Usage:
+    python benchmarks/bench_similarity.py --users 10000 100000 1000000 --jobs 1 8 32
+"""
+
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.similarity import top_k_cosine_neighbors, BLOCK_PAIR_BUDGET
+from benchmarks.synthetic import make_interactions, to_user_item_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count()])
+    parser.add_argument('--interactions-per-user', type=int, default=10)
+    parser.add_argument('--pins-per-user', type=float, default=5.0)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--block-size', type=int, default=1024)
+    parser.add_argument('--pair-budget', type=int, default=BLOCK_PAIR_BUDGET)
+    args = parser.parse_args()
+
+    for n_users in args.users:
+        interactions = make_interactions(
+            n_users, int(n_users * args.pins_per_user), n_users * args.interactions_per_user
+        )
+        matrix = to_user_item_matrix(interactions)
+        print(f"\n{matrix.shape[0]:,} users | {matrix.shape[1]:,} pins | {matrix.nnz:,} non-zeros")
+
+        baseline = None
+        for n_jobs in args.jobs:
+            t0 = time.perf_counter()
+            graph = top_k_cosine_neighbors(matrix, args.k, block_size=args.block_size, n_jobs=n_jobs,
+                                           pair_budget=args.pair_budget)
+            elapsed = time.perf_counter() - t0
+            baseline = baseline or elapsed
+            print(f"  n_jobs={n_jobs:<3} {elapsed:8.2f}s | speedup {baseline / elapsed:5.2f}x | "
+                  f"graph nnz {graph.nnz:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+run_suite.py — Fit / recommend latency, throughput and peak memory of the recommenders
+
+For each dataset scale (synthetic power-law interactions) and each of the three
+recommenders in src/models (collaborative filtering, matrix factorization,
+content-based), measures:
+  - fit time
+  - per-user recommend() latency p50 / p99
+  - recommend_batch() throughput (users / second)
+  - peak RSS
+
+Every (scale, model) case runs in a fresh worker process, so peak RSS covers
+only that case's data and model. Results are written as JSON (one file per
+commit by default) and can be compared across commits with --compare.
+
+Scales: 10k, 1m and 50m interactions. 50m needs tens of GB of RAM and is
+opt-in; collaborative filtering switches from the dense similarity matrix to
+the top-k graph once the user count makes n_users² floats impractical.
+
+Usage:
+    python benchmarks/run_suite.py --scales 10k 1m
+    python benchmarks/run_suite.py --scales 10k --models mf cb --output results.json
+    python benchmarks/run_suite.py --compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+
+import os, sys, time, json, argparse, platform, resource, subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import make_interactions, make_pins
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# interactions → (users, pins, interactions)
+SCALES = {
+    '10k': (2000, 5000, 10000),
+    '1m': (100000, 200000, 1000000),
+    '50m': (2000000, 5000000, 50000000),
+}
+MODELS = ['cf', 'mf', 'cb']
+DENSE_CF_MAX_USERS = 20000
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def build_model(name, n_users):
+    from src.models.collaborative_filtering import CollaborativeFilteringRecommender
+    from src.models.matrix_factorization import MatrixFactorizationRecommender
+    from src.models.content_based import ContentBasedRecommender
+
+    if name == 'cf':
+        similarity = 'dense' if n_users <= DENSE_CF_MAX_USERS else 'topk'
+        return CollaborativeFilteringRecommender(n_similar_users=20, similarity=similarity, n_jobs=-1)
+    if name == 'mf':
+        return MatrixFactorizationRecommender(n_factors=50, n_iterations=20)
+    return ContentBasedRecommender()
+
+
+def run_case(scale, name, n_requests, n_batch, seed):
+    """Generate one dataset, fit one model and measure it (runs in a worker process)."""
+    n_users, n_pins, n_interactions = SCALES[scale]
+    interactions = make_interactions(n_users, n_pins, n_interactions, seed=seed)
+    pins = make_pins(n_pins, seed=seed) if name == 'cb' else None
+    data_rss = peak_rss_mb()
+
+    model = build_model(name, n_users)
+    t0 = time.perf_counter()
+    model.fit(pins, interactions) if name == 'cb' else model.fit(interactions)
+    fit_seconds = time.perf_counter() - t0
+
+    rng = np.random.default_rng(seed)
+    known = np.asarray(model.user_ids, dtype=object)
+    request_users = rng.choice(known, min(n_requests, len(known)), replace=False).tolist()
+    batch_users = rng.choice(known, min(n_batch, len(known)), replace=False).tolist()
+
+    latencies = []
+    for user_id in request_users:
+        t0 = time.perf_counter()
+        model.recommend(user_id, n=10)
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1000
+
+    t0 = time.perf_counter()
+    model.recommend_batch(batch_users, n=10)
+    batch_seconds = time.perf_counter() - t0
+
+    return {
+        'scale': scale,
+        'model': name,
+        'model_class': type(model).__name__,
+        'n_users': len(known),
+        'n_pins': len(model.pin_ids),
+        'n_interactions': n_interactions,
+        'fit_seconds': round(fit_seconds, 3),
+        'recommend_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'recommend_p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'batch_users_per_second': round(len(batch_users) / batch_seconds, 1),
+        'data_rss_mb': data_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old_path, new_path):
+    """Print new / old ratios for every case present in both result files."""
+    with open(old_path) as f:
+        old = {(r['scale'], r['model']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+
+    metrics = ['fit_seconds', 'recommend_p50_ms', 'recommend_p99_ms', 'batch_users_per_second', 'peak_rss_mb']
+    print(f"{'case':<10}" + ''.join(f'{m:>26}' for m in metrics))
+    for result in new:
+        before = old.get((result['scale'], result['model']))
+        if before is None:
+            continue
+        cells = [f"{before[m]:>10} → {result[m]:<10} ({result[m] / before[m]:.2f}x)" if before[m] else 'n/a'
+                 for m in metrics]
+        print(f"{result['scale'] + '/' + result['model']:<10}" + ''.join(f'{c:>26}' for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['10k', '1m'])
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    results = []
+    for scale in args.scales:
+        for name in args.models:
+            # A fresh spawned process per case keeps peak RSS from leaking between cases
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result = pool.submit(run_case, scale, name, args.requests, args.batch, args.seed).result()
+            results.append(result)
+            print(f"{scale:>4} {name}: fit {result['fit_seconds']}s | p50 {result['recommend_p50_ms']} ms "
+                  f"| p99 {result['recommend_p99_ms']} ms | {result['batch_users_per_second']} users/s "
+                  f"| peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {output}")
+
+
+if __name__ == '__main__':
+    main()
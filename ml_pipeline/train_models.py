@@ -13,23 +13,34 @@ Dataset note: With ~1.79 interactions/user, pin-level precision/recall metrics a
 near-zero due to the cold-start problem — this is documented and expected.
 The category preference metric is the appropriate primary evaluation for this sparsity level.
 
+The three models and the category-preference CV train concurrently in separate
+worker processes. The loaded data is placed in shared memory once, encoded,
+instead of being pickled to each worker; a worker decodes a private copy of
+only the rows and columns its stage reads. metrics.json records each stage's wall time, CPU time (including its
+child processes) and peak RSS.
+
 Usage:
     python ml_pipeline/train_models.py
 """
 
-import os, sys, json, time
+import os, sys, json, time, resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+from joblib.externals.loky import get_reusable_executor
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.collaborative_filtering import CollaborativeFilteringRecommender
 from src.models.matrix_factorization import MatrixFactorizationRecommender
-from src.models.content_based import ContentBasedRecommender
+from src.models.content_based import ContentBasedRecommender, CONTENT_COLUMNS
 from src.models.evaluate_models import (
-    train_test_split_interactions, evaluate_model, evaluate_category_preference
+    train_test_split_interactions, evaluate_model, evaluate_category_preference, USER_FEATURE_COLUMNS
 )
+from src.utils.shared_frames import share_frame, attach_frame, share_array, attach_array, release
 
 DATA_DIR  = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'processed', 'cache')
 RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
 K = 10
 
@@ -44,64 +55,180 @@ def load_data():
     return interactions, pins, users
 
 
-def run_pipeline():
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    interactions, pins, users = load_data()
+# ── Pipeline stages ──────────────────────────────────────────────────────────
+# Each stage runs in its own spawned worker process. The loaded data is placed
+# in shared memory once (string columns integer-encoded, train/test as row
+# indices into the interactions); workers attach to it by name instead of
+# receiving pickled copies and decode only the rows and columns listed in
+# STAGE_FUNCS into private memory.
+# Per-stage resource usage comes from the worker and the pools it starts (the
+# evaluation fork pool, joblib's workers), reaped before it is read.
 
-    print("\nSplitting train/test (80/20 by recency per user)...")
-    train_df, test_df = train_test_split_interactions(interactions, test_ratio=0.2)
-    print(f"  Train: {len(train_df):,} | Test: {len(test_df):,}")
+STAGES = ['category_preference_prediction', 'collaborative_filtering', 'matrix_factorization', 'content_based']
 
-    all_metrics = {}
 
-    # ── Primary: Category Preference Prediction ──────────────────────────────
-    print("\n[PRIMARY] Category Preference Prediction (RandomForest, 5-fold CV)...")
-    cat_metrics = evaluate_category_preference(interactions, pins, users)
-    all_metrics['category_preference_prediction'] = cat_metrics
-    print(f"  Accuracy: {cat_metrics['accuracy']:.4f} (+/- {cat_metrics['std']:.4f})")
-    print(f"  Baseline: {cat_metrics['baseline_random']} | Lift: {cat_metrics['lift_over_random']}x")
+def _category_stage(data, n_jobs):
+    return evaluate_category_preference(data['interactions'], data['pins'], data['users'], n_jobs=n_jobs,
+                                        cache_dir=CACHE_DIR)
 
-    # ── 1. Collaborative Filtering ───────────────────────────────────────────
-    print("\n[1/3] Collaborative Filtering...")
+
+def _cf_stage(data, n_jobs):
     t0 = time.time()
     cf = CollaborativeFilteringRecommender(n_similar_users=20)
-    cf.fit(train_df)
+    cf.fit(data['train'])
     train_time = round(time.time() - t0, 2)
-    cf_metrics = evaluate_model(cf, train_df, test_df, k=K)
-    cf_metrics['train_time_seconds'] = train_time
-    all_metrics['collaborative_filtering'] = cf_metrics
-    print(f"  Coverage: {cf_metrics['coverage']} | Trained in {train_time}s")
+    metrics = evaluate_model(cf, data['train'], data['test'], k=K, n_jobs=n_jobs)
+    metrics['train_time_seconds'] = train_time
+    return metrics
 
-    # ── 2. Matrix Factorization ──────────────────────────────────────────────
-    print("\n[2/3] Matrix Factorization (SVD, 50 factors)...")
+
+def _mf_stage(data, n_jobs):
     t0 = time.time()
     mf = MatrixFactorizationRecommender(n_factors=50, n_iterations=20)
-    mf.fit(train_df)
+    mf.fit(data['train'])
     train_time = round(time.time() - t0, 2)
-    explained_var = round(mf.get_explained_variance(), 4)
-    mf_metrics = evaluate_model(mf, train_df, test_df, k=K)
-    mf_metrics['train_time_seconds'] = train_time
-    mf_metrics['explained_variance_ratio'] = explained_var
-    all_metrics['matrix_factorization'] = mf_metrics
-    print(f"  Coverage: {mf_metrics['coverage']} | Explained variance: {explained_var:.1%} | Trained in {train_time}s")
-
-    # ── 3. Content-Based ─────────────────────────────────────────────────────
-    print("\n[3/3] Content-Based Filtering (TF-IDF)...")
+    metrics = evaluate_model(mf, data['train'], data['test'], k=K, n_jobs=n_jobs)
+    metrics['train_time_seconds'] = train_time
+    metrics['explained_variance_ratio'] = round(mf.get_explained_variance(), 4)
+    return metrics
+
+
+def _cb_stage(data, n_jobs):
     t0 = time.time()
     cb = ContentBasedRecommender()
-    cb.fit(pins, train_df)
+    cb.fit(data['pins'], data['train'])
     train_time = round(time.time() - t0, 2)
-    cb_metrics = evaluate_model(cb, train_df, test_df, k=K)
-    cb_metrics['train_time_seconds'] = train_time
-    all_metrics['content_based'] = cb_metrics
-    print(f"  Coverage: {cb_metrics['coverage']} | Trained in {train_time}s")
+    metrics = evaluate_model(cb, data['train'], data['test'], k=K, n_jobs=n_jobs)
+    metrics['train_time_seconds'] = train_time
+    return metrics
+
+
+INTERACTION_COLUMNS = ['user_id', 'pin_id', 'interaction_type']
+SPLIT_COLUMNS = {'train': INTERACTION_COLUMNS, 'test': INTERACTION_COLUMNS}
+
+# stage → (function, {frame: columns it reads})
+STAGE_FUNCS = {
+    'category_preference_prediction': (_category_stage, {
+        'interactions': INTERACTION_COLUMNS,
+        'pins': ['pin_id', 'category'],
+        'users': ['user_id'] + USER_FEATURE_COLUMNS,
+    }),
+    'collaborative_filtering': (_cf_stage, SPLIT_COLUMNS),
+    'matrix_factorization': (_mf_stage, SPLIT_COLUMNS),
+    'content_based': (_cb_stage, {'pins': ['pin_id'] + CONTENT_COLUMNS, **SPLIT_COLUMNS}),
+}
+
+
+def _usage(who):
+    """
+    CPU seconds and peak RSS in MB (ru_maxrss is KiB on Linux, bytes on macOS)
+    of this process (RUSAGE_SELF) or its terminated, reaped children
+    (RUSAGE_CHILDREN, whose peak is the largest single child's).
+    """
+    usage = resource.getrusage(who)
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return usage.ru_utime + usage.ru_stime, round(peak, 1)
+
+
+def _run_stage(stage, specs, n_jobs):
+    """Worker entry point: attach the shared data a stage needs, run it, account resources."""
+    wall0 = time.perf_counter()
+    cpu0, children_cpu0 = _usage(resource.RUSAGE_SELF)[0], _usage(resource.RUSAGE_CHILDREN)[0]
+    func, needs = STAGE_FUNCS[stage]
+
+    segments, data = [], {}
+    try:
+        for name, columns in needs.items():
+            if name in ('train', 'test'):
+                rows = attach_array(specs[f'{name}_idx'], segments)
+                data[name] = attach_frame(specs['interactions'], segments, rows=rows, columns=columns)
+            else:
+                data[name] = attach_frame(specs[name], segments, columns=columns)
+    finally:
+        release(segments)
+
+    metrics = func(data, n_jobs)
+    # Reap joblib's reusable workers (cross-validation) so RUSAGE_CHILDREN counts them
+    get_reusable_executor().shutdown(wait=True)
+
+    cpu, peak_rss = _usage(resource.RUSAGE_SELF)
+    children_cpu, children_peak_rss = _usage(resource.RUSAGE_CHILDREN)
+    metrics['resources'] = {
+        'wall_seconds': round(time.perf_counter() - wall0, 2),
+        'cpu_seconds': round(cpu - cpu0 + children_cpu - children_cpu0, 2),
+        'children_cpu_seconds': round(children_cpu - children_cpu0, 2),
+        'peak_rss_mb': peak_rss,
+        'children_peak_rss_mb': children_peak_rss,
+    }
+    return metrics
+
+
+def run_pipeline():
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    interactions, pins, users = load_data()
+    pipeline_start = time.perf_counter()
+
+    print("\nSplitting train/test (80/20 by recency per user)...")
+    train_idx, test_idx = train_test_split_interactions(interactions, test_ratio=0.2, return_indices=True)
+    print(f"  Train: {len(train_idx):,} | Test: {len(test_idx):,}")
+
+    # ── Train all stages concurrently from shared memory ────────────────────
+    print(f"\nTraining {len(STAGES)} stages concurrently...")
+    n_jobs = max(1, (os.cpu_count() or 1) // len(STAGES))
+    segments, pools = [], []
+    try:
+        # No stage reads timestamps, so only the columns they use are shared
+        specs = {
+            'interactions': share_frame(interactions[INTERACTION_COLUMNS], segments),
+            'pins': share_frame(pins, segments),
+            'users': share_frame(users, segments),
+            'train_idx': share_array(train_idx, segments),
+            'test_idx': share_array(test_idx, segments),
+        }
+
+        # One single-worker pool per stage: a fresh process each, so peak RSS is per stage
+        futures = {}
+        for stage in STAGES:
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            pools.append(pool)
+            futures[stage] = pool.submit(_run_stage, stage, specs, n_jobs)
+        all_metrics = {stage: futures[stage].result() for stage in STAGES}
+    finally:
+        for pool in pools:
+            pool.shutdown()
+        release(segments, unlink=True)
+    pipeline_wall = round(time.perf_counter() - pipeline_start, 2)
+
+    cat_metrics = all_metrics['category_preference_prediction']
+    cf_metrics = all_metrics['collaborative_filtering']
+    mf_metrics = all_metrics['matrix_factorization']
+    cb_metrics = all_metrics['content_based']
+    explained_var = mf_metrics['explained_variance_ratio']
+
+    print("\n[PRIMARY] Category Preference Prediction (RandomForest, 5-fold CV)...")
+    print(f"  Accuracy: {cat_metrics['accuracy']:.4f} (+/- {cat_metrics['std']:.4f})")
+    print(f"  Baseline: {cat_metrics['baseline_random']} | Lift: {cat_metrics['lift_over_random']}x")
+    print("\n[1/3] Collaborative Filtering...")
+    print(f"  Coverage: {cf_metrics['coverage']} | Trained in {cf_metrics['train_time_seconds']}s")
+    print("\n[2/3] Matrix Factorization (SVD, 50 factors)...")
+    print(f"  Coverage: {mf_metrics['coverage']} | Explained variance: {explained_var:.1%} "
+          f"| Trained in {mf_metrics['train_time_seconds']}s")
+    print("\n[3/3] Content-Based Filtering (TF-IDF)...")
+    print(f"  Coverage: {cb_metrics['coverage']} | Trained in {cb_metrics['train_time_seconds']}s")
+
+    print("\nStage resources:")
+    for stage in STAGES:
+        res = all_metrics[stage]['resources']
+        print(f"  {stage:<32} wall {res['wall_seconds']:>7}s | cpu {res['cpu_seconds']:>7}s "
+              f"| peak RSS {res['peak_rss_mb']} MB (largest child {res['children_peak_rss_mb']} MB)")
+    print(f"  pipeline wall time: {pipeline_wall}s")
 
     # ── Save results ─────────────────────────────────────────────────────────
     summary = {
         'dataset': {
             'total_interactions': len(interactions),
-            'train_interactions': len(train_df),
-            'test_interactions': len(test_df),
+            'train_interactions': len(train_idx),
+            'test_interactions': len(test_idx),
             'unique_users': interactions['user_id'].nunique(),
             'unique_pins': interactions['pin_id'].nunique(),
             'avg_interactions_per_user': round(len(interactions)/interactions['user_id'].nunique(), 2),
@@ -112,6 +239,11 @@ def run_pipeline():
             'due to cold-start — this is expected and documented. '
             'Category preference prediction is the meaningful primary metric.'
         ),
+        'pipeline': {
+            'wall_seconds': pipeline_wall,
+            'stage_wall_seconds_total': round(sum(m['resources']['wall_seconds'] for m in all_metrics.values()), 2),
+            'concurrent_stages': len(STAGES),
+        },
         'models': all_metrics,
     }
 
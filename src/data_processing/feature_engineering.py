@@ -1,14 +1,46 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from scipy.sparse import csr_matrix
-import pickle
-import os
+
+from src.data_processing.feature_store import FeatureStore, FeatureStoreWriter
+from src.utils.cache import ArtifactCache, file_digest, fingerprint, source_digest
+from src.utils.helpers import top_n_per_row
+
+
+# Interaction weights (saves worth more than clicks)
+INTERACTION_WEIGHTS = {
+    'save': 5,
+    'like': 3,
+    'share': 4,
+    'click': 1,
+    'comment': 2
+}
+
+
+def load_user_item_matrix(store_path='data/processed/feature_store', version=None):
+    """
+    Open the user-item matrix of a feature store version (memory-mapped).
+    The result plugs straight into the recommenders' fit_matrix(matrix, user_ids, pin_ids).
+    """
+    store = FeatureStore(store_path, version)
+    return {
+        'matrix': store.csr('user_item_matrix'),
+        'user_ids': store.array('user_ids'),
+        'pin_ids': store.array('pin_ids')
+    }
+
 
 class FeatureEngineer:
-    def __init__(self, data_path='data/raw/'):
+    def __init__(self, data_path='data/raw/', similarity_k=50):
         self.data_path = data_path
+        self.similarity_k = similarity_k
         self.users_df = None
         self.pins_df = None
         self.interactions_df = None
@@ -22,32 +54,36 @@ class FeatureEngineer:
         
         print(f"Loaded {len(self.users_df)} users, {len(self.pins_df)} pins, {len(self.interactions_df)} interactions")
         
-    def create_user_item_matrix(self):
+    def create_user_item_matrix(self, interaction_weights=INTERACTION_WEIGHTS):
         """Create user-item interaction matrix for collaborative filtering"""
         print("Creating user-item matrix...")
         
-        # Create interaction weights (saves worth more than clicks)
-        interaction_weights = {
-            'save': 5,
-            'like': 3,
-            'share': 4,
-            'click': 1,
-            'comment': 2
-        }
+        # Add weights to interactions (on a copy, so stages can run concurrently);
+        # rows without a weight or an id are dropped, as pivot_table drops them
+        weighted = self.interactions_df.assign(
+            weight=self.interactions_df['interaction_type'].map(interaction_weights)
+        ).dropna(subset=['weight', 'user_id', 'pin_id'])
         
-        # Add weights to interactions
-        self.interactions_df['weight'] = self.interactions_df['interaction_type'].map(interaction_weights)
+        # Integer-code ids (sorted, the same row/column order pivot_table produced)
+        rows, user_ids = pd.factorize(weighted['user_id'], sort=True)
+        cols, pin_ids = pd.factorize(weighted['pin_id'], sort=True)
         
-        # Create pivot table
-        user_item_matrix = self.interactions_df.pivot_table(
-            index='user_id',
-            columns='pin_id', 
-            values='weight',
-            fill_value=0
+        # Mean weight per user-pin pair, as pivot_table's default aggregation
+        pairs = rows.astype(np.int64) * len(pin_ids) + cols
+        keys, inverse = np.unique(pairs, return_inverse=True)
+        weights = np.bincount(inverse, weights=weighted['weight'].values) / np.bincount(inverse)
+        
+        matrix = csr_matrix(
+            (weights.astype(np.float32), (keys // len(pin_ids), keys % len(pin_ids))),
+            shape=(len(user_ids), len(pin_ids))
         )
         
-        print(f"User-item matrix shape: {user_item_matrix.shape}")
-        return user_item_matrix.astype(np.float32)
+        print(f"User-item matrix shape: {matrix.shape}, {matrix.nnz} non-zeros")
+        return {
+            'matrix': matrix,
+            'user_ids': np.asarray(user_ids),
+            'pin_ids': np.asarray(pin_ids)
+        }
         
     def create_user_profiles(self):
         """Create user preference profiles based on interactions"""
@@ -83,12 +119,12 @@ class FeatureEngineer:
         print(f"User profiles shape: {user_profiles.shape}")
         return user_profiles
         
-    def create_pin_features(self):
+    def create_pin_features(self, max_features=1000):
         """Create pin feature vectors for content-based filtering"""
         print("Creating pin features...")
         
         # Combine text features
-        self.pins_df['text_features'] = (
+        text_features = (
             self.pins_df['title'].fillna('') + ' ' + 
             self.pins_df['description'].fillna('') + ' ' +
             self.pins_df['category'] + ' ' +
@@ -96,8 +132,8 @@ class FeatureEngineer:
         )
         
         # Create TF-IDF vectors
-        tfidf = TfidfVectorizer(max_features=1000, stop_words='english')
-        text_features = tfidf.fit_transform(self.pins_df['text_features'])
+        tfidf = TfidfVectorizer(max_features=max_features, stop_words='english')
+        text_features = tfidf.fit_transform(text_features)
         
         # Normalize numerical features
         numerical_features = self.pins_df[['trending_score', 'saves_count', 'likes_count', 'width', 'height']].fillna(0)
@@ -111,27 +147,47 @@ class FeatureEngineer:
             'tfidf_vectorizer': tfidf
         }
         
-    def calculate_pin_similarities(self, pin_features):
-        """Calculate pin-to-pin similarity matrix"""
+    def calculate_pin_similarities(self, pin_features, k=50, block_size=512):
+        """Calculate the top-k related pins of every pin as a sparse CSR graph"""
         print("Calculating pin similarities...")
         
         # Combine text and numerical features (weighted)
         text_weight = 0.7
         num_weight = 0.3
         
-        # Normalize and combine features
-        from sklearn.preprocessing import normalize
-        text_norm = normalize(pin_features['text_features'])
-        num_norm = normalize(pin_features['numerical_features'])
-        
-        # Calculate similarities
-        text_sim = cosine_similarity(text_norm)
-        num_sim = cosine_similarity(num_norm)
-        
-        # Weighted combination
-        pin_similarity = text_weight * text_sim + num_weight * num_sim
+        # Normalize features; cosine similarity is then a plain dot product
+        text_norm = normalize(pin_features['text_features']).astype(np.float32).tocsr()
+        text_norm_t = text_norm.T.tocsr()
+        num_norm = normalize(pin_features['numerical_features']).astype(np.float32)
+        n_pins = text_norm.shape[0]
+        k = min(k, max(n_pins - 1, 0))
+        
+        # Score one block of pins against all pins at a time, keeping only its top-k
+        rows, cols, values = [], [], []
+        for start in range(0, n_pins, block_size):
+            stop = min(start + block_size, n_pins)
+            block = np.arange(start, stop)
+            sims = text_weight * (text_norm[start:stop] @ text_norm_t).toarray()
+            sims += num_weight * (num_norm[start:stop] @ num_norm.T)
+            sims[block - start, block] = -np.inf
+            
+            top = top_n_per_row(sims, k)
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            keep = top_sims > 0
+            rows.append(np.repeat(block, keep.sum(axis=1)))
+            cols.append(top[keep])
+            values.append(top_sims[keep])
+        
+        # Entries are appended row by row, highest similarity first
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_pins))])
+        pin_similarity = csr_matrix(
+            (np.concatenate(values) if values else np.empty(0, dtype=np.float32),
+             np.concatenate(cols) if cols else np.empty(0, dtype=np.intp), indptr),
+            shape=(n_pins, n_pins)
+        )
         
-        print(f"Pin similarity matrix shape: {pin_similarity.shape}")
+        print(f"Pin similarity graph: {pin_similarity.shape}, {pin_similarity.nnz} edges (top {k} per pin)")
         return pin_similarity
         
     def calculate_trending_scores(self):
@@ -139,11 +195,12 @@ class FeatureEngineer:
         print("Calculating trending scores...")
         
         # Convert timestamp to datetime
-        self.interactions_df['timestamp'] = pd.to_datetime(self.interactions_df['timestamp'])
+        timestamps = pd.to_datetime(self.interactions_df['timestamp'])
+        interactions = self.interactions_df.assign(timestamp=timestamps)
         
         # Recent interactions (last 7 days)
-        recent_cutoff = self.interactions_df['timestamp'].max() - pd.Timedelta(days=7)
-        recent_interactions = self.interactions_df[self.interactions_df['timestamp'] > recent_cutoff]
+        recent_cutoff = timestamps.max() - pd.Timedelta(days=7)
+        recent_interactions = interactions[timestamps > recent_cutoff]
         
         # Calculate recent engagement
         recent_engagement = recent_interactions.groupby('pin_id').agg({
@@ -166,63 +223,141 @@ class FeatureEngineer:
         
         return pins_with_trending[['pin_id', 'trending_score_updated']]
         
-    def save_features(self, user_item_matrix, user_profiles, pin_features, pin_similarity, trending_scores):
-        """Save all engineered features"""
+    def save_features(self, user_item_matrix, user_profiles, pin_features, pin_similarity, trending_scores,
+                      store_path='data/processed/feature_store', metadata=None):
+        """Save all engineered features as a new feature store version"""
         print("Saving engineered features...")
         
-        os.makedirs('data/processed/', exist_ok=True)
+        writer = FeatureStoreWriter(store_path)
         
         # Save matrices
-        np.save('data/processed/user_item_matrix.npy', user_item_matrix.values)
-        np.save('data/processed/user_profiles.npy', user_profiles.values)
-        np.save('data/processed/pin_similarity.npy', pin_similarity)
+        writer.add_csr('user_item_matrix', user_item_matrix['matrix'])
+        writer.add_array('user_profiles', user_profiles.values)
+        writer.add_csr('pin_similarity', pin_similarity)
         
         # Save feature mappings
-        feature_mappings = {
-            'user_ids': user_item_matrix.index.tolist(),
-            'pin_ids': user_item_matrix.columns.tolist(),
-            'user_profile_ids': user_profiles.index.tolist(),
-            'categories': user_profiles.columns.tolist(),
-            'pin_feature_ids': self.pins_df['pin_id'].tolist()
-        }
+        writer.add_array('user_ids', user_item_matrix['user_ids'])
+        writer.add_array('pin_ids', user_item_matrix['pin_ids'])
+        writer.add_array('user_profile_ids', user_profiles.index.values)
+        writer.add_array('categories', user_profiles.columns.values)
+        writer.add_array('pin_feature_ids', self.pins_df['pin_id'].values)
         
-        with open('data/processed/feature_mappings.pkl', 'wb') as f:
-            pickle.dump(feature_mappings, f)
-            
         # Save TF-IDF vectorizer
-        with open('data/processed/tfidf_vectorizer.pkl', 'wb') as f:
-            pickle.dump(pin_features['tfidf_vectorizer'], f)
-            
+        writer.add_object('tfidf_vectorizer', pin_features['tfidf_vectorizer'])
+        
         # Save trending scores
-        trending_scores.to_csv('data/processed/trending_scores.csv', index=False)
+        writer.add_table('trending_scores', trending_scores)
         
-        print("Features saved successfully!")
+        version = writer.commit(metadata)
+        print(f"Features saved successfully! ({store_path}/{version})")
         
-    def run_feature_engineering(self):
-        """Main feature engineering pipeline"""
+    def _stage_specs(self):
+        """Pipeline stages in dependency order: input files, upstream stages, parameters (passed to `run`)"""
+        return {
+            'user_item_matrix': {
+                'files': ('interactions',), 'deps': (), 'params': {'interaction_weights': INTERACTION_WEIGHTS},
+                'run': self.create_user_item_matrix
+            },
+            'user_profiles': {
+                'files': ('interactions', 'pins'), 'deps': (), 'params': {},
+                'run': self.create_user_profiles
+            },
+            'pin_features': {
+                'files': ('pins',), 'deps': (), 'params': {'max_features': 1000},
+                'run': self.create_pin_features
+            },
+            'pin_similarity': {
+                'files': (), 'deps': ('pin_features',), 'params': {'k': self.similarity_k},
+                'run': self.calculate_pin_similarities
+            },
+            'trending_scores': {
+                'files': ('interactions', 'pins'), 'deps': (), 'params': {},
+                'run': self.calculate_trending_scores
+            },
+        }
+        
+    def _run_stage(self, name, spec, key, cache, upstream):
+        """Return (result, status), reusing the cached artifact when its fingerprint matches"""
+        start = time.perf_counter()
+        result = cache.get(name, key) if cache is not None else None
+        cached = result is not None
+        if not cached:
+            result = spec['run'](*upstream, **spec['params'])
+            if cache is not None:
+                cache.put(name, key, result)
+        return result, {'cached': cached, 'seconds': round(time.perf_counter() - start, 3)}
+        
+    def run_feature_engineering(self, use_cache=True, n_jobs=-1, cache_dir='data/processed/cache/',
+                                store_path='data/processed/feature_store', metadata=None):
+        """
+        Main feature engineering pipeline. Each stage is skipped when its
+        fingerprint (input file hashes + parameters + the stage method's
+        source + upstream fingerprints) matches a cached artifact; stages run
+        concurrently in a thread pool as soon as their upstream stages finish.
+        `metadata` is stored in the new version's manifest alongside the stage
+        fingerprints.
+        """
         print("Starting feature engineering pipeline...")
         
         # Load data
         self.load_data()
+        digests = {
+            name: file_digest(f'{self.data_path}pinterest_{name}.csv')
+            for name in ('users', 'pins', 'interactions')
+        }
         
-        # Create features
-        user_item_matrix = self.create_user_item_matrix()
-        user_profiles = self.create_user_profiles()
-        pin_features = self.create_pin_features()
-        pin_similarity = self.calculate_pin_similarities(pin_features)
-        trending_scores = self.calculate_trending_scores()
-        
-        # Save features
-        self.save_features(user_item_matrix, user_profiles, pin_features, pin_similarity, trending_scores)
+        # Fingerprint every stage (specs are in dependency order)
+        stages = self._stage_specs()
+        keys = {}
+        for name, spec in stages.items():
+            keys[name] = fingerprint(
+                stage=name,
+                files={f: digests[f] for f in spec['files']},
+                params=spec['params'],
+                code=source_digest(spec['run']),
+                upstream={d: keys[d] for d in spec['deps']}
+            )
+        
+        # Create features, each stage starting once its upstream results exist
+        cache = ArtifactCache(cache_dir) if use_cache else None
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        results, self.stage_status = {}, {}
+        pending, running = dict(stages), {}
+        with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as pool:
+            while pending or running:
+                for name in [n for n, spec in pending.items() if all(d in results for d in spec['deps'])]:
+                    spec = pending.pop(name)
+                    upstream = [results[d] for d in spec['deps']]
+                    running[pool.submit(self._run_stage, name, spec, keys[name], cache, upstream)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name], self.stage_status[name] = future.result()
+        
+        for name, status in self.stage_status.items():
+            print(f"  {name}: {'cached' if status['cached'] else 'computed'} ({status['seconds']}s)")
+        
+        # Save features, unless the latest store version already holds these exact stages and metadata
+        metadata = {**(metadata or {}), 'stage_fingerprints': keys}
+        if self._store_is_current(store_path, metadata):
+            print("Feature store is up to date")
+        else:
+            self.save_features(
+                results['user_item_matrix'], results['user_profiles'], results['pin_features'],
+                results['pin_similarity'], results['trending_scores'],
+                store_path=store_path, metadata=metadata
+            )
         
         print("Feature engineering complete!")
-        return {
-            'user_item_matrix': user_item_matrix,
-            'user_profiles': user_profiles,
-            'pin_features': pin_features,
-            'pin_similarity': pin_similarity,
-            'trending_scores': trending_scores
-        }
+        return results
+        
+    @staticmethod
+    def _store_is_current(store_path, metadata):
+        try:
+            store = FeatureStore(store_path)
+        except FileNotFoundError:
+            return False
+        return store.manifest.get('metadata') == json.loads(json.dumps(metadata, default=str))
 
 if __name__ == "__main__":
     engineer = FeatureEngineer()
@@ -0,0 +1,134 @@
+"""
+Versioned, memory-mappable feature store for FeatureEngineer outputs.
+
+Layout of a store root:
+
+    <root>/
+        LATEST                 name of the newest complete version
+        v0001/
+            manifest.json      format version, creation time, one entry per feature
+            user_ids.npy       arrays (factors, id maps) as raw .npy
+            user_item_matrix/  sparse matrices as data/indices/indptr .npy
+            trending_scores.parquet   tables as Parquet
+            tfidf_vectorizer.pkl      fitted objects that have no array form
+
+Arrays open with mmap_mode='r', so a reader maps pages on demand and every
+process reading the same version shares them through the OS page cache.
+A version becomes visible only when LATEST is swapped to it, after all of
+its files and its manifest are written.
+"""
+
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+FORMAT_VERSION = 1
+
+
+def _mappable(array):
+    """Object arrays (e.g. string ids) can't be memory-mapped; store them as fixed-width unicode."""
+    array = np.asarray(array)
+    return array.astype(str) if array.dtype == object else array
+
+
+class FeatureStoreWriter:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        existing = [int(d[1:]) for d in os.listdir(root) if d.startswith('v') and d[1:].isdigit()]
+        self.version = f'v{max(existing, default=0) + 1:04d}'
+        self.path = os.path.join(root, self.version)
+        os.makedirs(self.path)
+        self.entries = {}
+
+    def add_array(self, name, array):
+        array = _mappable(array)
+        np.save(os.path.join(self.path, f'{name}.npy'), array)
+        self.entries[name] = {'kind': 'array', 'shape': list(array.shape), 'dtype': array.dtype.str}
+
+    def add_csr(self, name, matrix):
+        matrix = csr_matrix(matrix)
+        os.makedirs(os.path.join(self.path, name))
+        for part in ('data', 'indices', 'indptr'):
+            np.save(os.path.join(self.path, name, f'{part}.npy'), getattr(matrix, part))
+        self.entries[name] = {'kind': 'csr', 'shape': list(matrix.shape), 'nnz': int(matrix.nnz)}
+
+    def add_table(self, name, df):
+        df.to_parquet(os.path.join(self.path, f'{name}.parquet'), engine='pyarrow', index=False)
+        self.entries[name] = {'kind': 'table', 'rows': len(df), 'columns': [str(c) for c in df.columns]}
+
+    def add_object(self, name, obj):
+        with open(os.path.join(self.path, f'{name}.pkl'), 'wb') as f:
+            pickle.dump(obj, f)
+        self.entries[name] = {'kind': 'object'}
+
+    def commit(self, metadata=None):
+        """Write the manifest, then point LATEST at this version."""
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'version': self.version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'entries': self.entries,
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        tmp = os.path.join(self.root, 'LATEST.tmp')
+        with open(tmp, 'w') as f:
+            f.write(self.version)
+        os.replace(tmp, os.path.join(self.root, 'LATEST'))
+        return self.version
+
+
+class FeatureStore:
+    def __init__(self, root='data/processed/feature_store', version=None):
+        if version is None:
+            with open(os.path.join(root, 'LATEST')) as f:
+                version = f.read().strip()
+        self.root = root
+        self.version = version
+        self.path = os.path.join(root, version)
+        with open(os.path.join(self.path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] > FORMAT_VERSION:
+            raise ValueError(f"Feature store format {self.manifest['format_version']} is newer than supported ({FORMAT_VERSION})")
+
+    def __contains__(self, name):
+        return name in self.manifest['entries']
+
+    def _entry(self, name, kind):
+        entry = self.manifest['entries'].get(name)
+        if entry is None:
+            raise KeyError(f"No feature {name!r} in {self.path}")
+        if entry['kind'] != kind:
+            raise ValueError(f"Feature {name!r} is a {entry['kind']}, not a {kind}")
+        return entry
+
+    def array(self, name, mmap_mode='r'):
+        """Open an array without reading it; pages load on first access."""
+        self._entry(name, 'array')
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+    def csr(self, name, mmap_mode='r'):
+        """Sparse matrix whose data/indices/indptr are memory-mapped."""
+        entry = self._entry(name, 'csr')
+        parts = [np.load(os.path.join(self.path, name, f'{part}.npy'), mmap_mode=mmap_mode)
+                 for part in ('data', 'indices', 'indptr')]
+        return csr_matrix(tuple(parts), shape=tuple(entry['shape']), copy=False)
+
+    def table(self, name, columns=None):
+        """Read a Parquet table, optionally only some columns."""
+        self._entry(name, 'table')
+        return pd.read_parquet(os.path.join(self.path, f'{name}.parquet'), engine='pyarrow',
+                               columns=columns, memory_map=True)
+
+    def object(self, name):
+        self._entry(name, 'object')
+        with open(os.path.join(self.path, f'{name}.pkl'), 'rb') as f:
+            return pickle.load(f)
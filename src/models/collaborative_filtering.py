@@ -2,13 +2,32 @@
 Collaborative Filtering recommender using user-item interaction matrix.
 Computes user similarity via cosine similarity and recommends pins
 that similar users have interacted with.
+
+Three similarity modes are supported:
+  - 'dense': full n_users × n_users cosine matrix (fine for small datasets)
+  - 'topk':  sparse graph keeping only the top `n_similar_users` neighbors
+             per user, built from blocked sparse products (optionally in a
+             process pool over shared memory, see `n_jobs`)
+  - 'lsh':   approximate top-k graph from signed random projection buckets
+             of about `lsh_bucket_size` users, built in time linear in users;
+             tune recall/speed with `lsh_tables`, `lsh_bucket_size` and
+             `lsh_probes` (see benchmarks/bench_lsh.py; on synthetic data the
+             defaults give ~0.82 recall@20 at 2.3x the speed of 'topk' at 50k
+             users, and recall falls slowly as users grow unless tables do;
+             below ~20k users 'topk' is as fast)
 """
 
 import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.utils.extmath import row_norms
 from scipy.sparse import csr_matrix
 
+from src.models.similarity import (top_k_cosine_neighbors, update_top_k_cosine_neighbors, cosine_rows,
+                                   resize_csr, replace_rows)
+from src.models.lsh import lsh_cosine_neighbors
+from src.utils.helpers import top_n_indices, top_n_per_row, lookup_known, grow_buffer
+
 
 # Interaction weights — saves are strongest signal, comments weakest
 INTERACTION_WEIGHTS = {
@@ -21,14 +40,38 @@ INTERACTION_WEIGHTS = {
 
 
 class CollaborativeFilteringRecommender:
-    def __init__(self, n_similar_users=20):
+    def __init__(self, n_similar_users=20, similarity='dense', block_size=1024, n_jobs=1,
+                 lsh_tables=16, lsh_bucket_size=96, lsh_probes=2, lsh_bits=None, lsh_random_state=42):
+        if similarity not in ('dense', 'topk', 'lsh'):
+            raise ValueError(f"Unknown similarity mode: {similarity!r}")
         self.n_similar_users = n_similar_users
+        self.similarity = similarity
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.lsh_tables = lsh_tables
+        self.lsh_bucket_size = lsh_bucket_size
+        self.lsh_probes = lsh_probes
+        self.lsh_bits = lsh_bits
+        self.lsh_random_state = lsh_random_state
         self.user_item_matrix = None
         self.user_similarity = None
+        self.user_neighbors = None
         self.user_ids = None
         self.pin_ids = None
         self.user_index = None
         self.pin_index = None
+        # partial_fit state: buffers with spare capacity for the row norms, and
+        # the ones user_ids, pin_ids and the dense user_similarity are views of
+        self._row_norms = None
+        self._user_id_buffer = None
+        self._pin_id_buffer = None
+        self._similarity_buffer = None
+
+    def __getstate__(self):
+        # Pickle the dense similarity without its buffer's spare capacity
+        state = self.__dict__.copy()
+        state['_similarity_buffer'] = None
+        return state
 
     def fit(self, interactions_df):
         """Build user-item matrix and compute user similarities."""
@@ -38,41 +81,189 @@ class CollaborativeFilteringRecommender:
         # Aggregate weights per user-pin pair
         agg = df.groupby(['user_id', 'pin_id'])['weight'].sum().reset_index()
 
-        self.user_ids = agg['user_id'].unique()
-        self.pin_ids = agg['pin_id'].unique()
+        user_ids = agg['user_id'].unique()
+        pin_ids = agg['pin_id'].unique()
+        rows = agg['user_id'].map({u: i for i, u in enumerate(user_ids)})
+        cols = agg['pin_id'].map({p: i for i, p in enumerate(pin_ids)})
+        matrix = csr_matrix(
+            (agg['weight'].values, (rows, cols)),
+            shape=(len(user_ids), len(pin_ids))
+        )
+        return self.fit_matrix(matrix, user_ids, pin_ids)
+
+    def fit_matrix(self, user_item_matrix, user_ids, pin_ids):
+        """Fit on a prebuilt sparse user × pin weight matrix (e.g. FeatureEngineer's)."""
+        self.user_ids = np.asarray(user_ids)
+        self.pin_ids = np.asarray(pin_ids)
         self.user_index = {u: i for i, u in enumerate(self.user_ids)}
         self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+        self.user_item_matrix = csr_matrix(user_item_matrix, dtype=np.float64)
+        self._row_norms = row_norms(self.user_item_matrix)
+        self._user_id_buffer = self._pin_id_buffer = self._similarity_buffer = None
+
+        # Cosine similarity between users
+        if self.similarity == 'topk':
+            self.user_similarity = None
+            self.user_neighbors = top_k_cosine_neighbors(
+                self.user_item_matrix, self.n_similar_users,
+                block_size=self.block_size, n_jobs=self.n_jobs
+            )
+        elif self.similarity == 'lsh':
+            self.user_similarity = None
+            self.user_neighbors = lsh_cosine_neighbors(
+                self.user_item_matrix, self.n_similar_users,
+                n_tables=self.lsh_tables, n_bits=self.lsh_bits, n_probes=self.lsh_probes,
+                bucket_size=self.lsh_bucket_size, block_size=self.block_size,
+                random_state=self.lsh_random_state
+            )
+        else:
+            self.user_neighbors = None
+            self.user_similarity = self._similarity_buffer = cosine_similarity(self.user_item_matrix)
+        return self
 
-        rows = agg['user_id'].map(self.user_index)
-        cols = agg['pin_id'].map(self.pin_index)
-        data = agg['weight'].values
+    def partial_fit(self, new_interactions_df):
+        """
+        Fold new interactions into a fitted model.
 
-        self.user_item_matrix = csr_matrix(
-            (data, (rows, cols)),
-            shape=(len(self.user_ids), len(self.pin_ids))
-        )
+        Unseen users and pins are appended to the index, weights are added into
+        the touched rows of the matrix, and similarities are recomputed only for
+        the users the new events touched, scaled by cached row norms. Id arrays
+        and the dense similarity matrix grow into buffers of doubling capacity,
+        so appending a user does not copy the whole model.
+        """
+        if self.user_item_matrix is None:
+            return self.fit(new_interactions_df)
 
-        # Cosine similarity between users
-        self.user_similarity = cosine_similarity(self.user_item_matrix)
+        df = new_interactions_df.copy()
+        df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
+        agg = df.groupby(['user_id', 'pin_id'])['weight'].sum().reset_index()
+        if agg.empty:
+            return self
+
+        # Append unseen users and pins, keeping existing row/column positions
+        new_users = [u for u in agg['user_id'].unique() if u not in self.user_index]
+        new_pins = [p for p in agg['pin_id'].unique() if p not in self.pin_index]
+        for u in new_users:
+            self.user_index[u] = len(self.user_index)
+        for p in new_pins:
+            self.pin_index[p] = len(self.pin_index)
+        self.user_ids, self._user_id_buffer = self._append_ids(self.user_ids, self._user_id_buffer, new_users)
+        self.pin_ids, self._pin_id_buffer = self._append_ids(self.pin_ids, self._pin_id_buffer, new_pins)
+
+        # Per-id dict lookups (Series.map with a dict would convert the whole index)
+        rows = np.array([self.user_index[u] for u in agg['user_id']], dtype=np.intp)
+        cols = np.array([self.pin_index[p] for p in agg['pin_id']], dtype=np.intp)
+        touched = np.unique(rows)
+
+        # Add the new weights into the touched rows only and splice them back in
+        matrix = resize_csr(self.user_item_matrix, (len(self.user_ids), len(self.pin_ids)))
+        delta = csr_matrix((agg['weight'].values, (np.searchsorted(touched, rows), cols)),
+                           shape=(len(touched), matrix.shape[1]))
+        block = matrix[touched] + delta
+        self.user_item_matrix = replace_rows(matrix, touched, block)
+
+        self._row_norms = grow_buffer(self._row_norms, len(self.user_ids))
+        self._row_norms[touched] = row_norms(block)
+        norms = self._row_norms[:len(self.user_ids)]
+
+        if self.user_neighbors is not None:
+            self.user_neighbors = update_top_k_cosine_neighbors(
+                self.user_neighbors, self.user_item_matrix, touched, self.n_similar_users, norms=norms
+            )
+        else:
+            self._grow_similarity(len(self.user_ids))
+            sims = cosine_rows(self.user_item_matrix, touched, norms).toarray()
+            self.user_similarity[touched, :] = sims
+            self.user_similarity[:, touched] = sims.T
         return self
 
+    @staticmethod
+    def _append_ids(ids, buffer, new_ids):
+        """Append ids into the spare capacity of their buffer; returns (ids view, buffer)."""
+        if not new_ids:
+            return ids, buffer
+        if buffer is None:
+            buffer = np.asarray(ids, dtype=object)
+        n = len(ids)
+        buffer = grow_buffer(buffer, n + len(new_ids))
+        buffer[n:n + len(new_ids)] = new_ids
+        return buffer[:n + len(new_ids)], buffer
+
+    def _grow_similarity(self, n):
+        """Make user_similarity an n × n view of a buffer grown by doubling (new cells are zero)."""
+        buffer = self._similarity_buffer if self._similarity_buffer is not None else self.user_similarity
+        capacity = buffer.shape[0]
+        if n > capacity:
+            grown = np.zeros((max(n, 2 * capacity),) * 2)
+            grown[:capacity, :capacity] = buffer[:capacity, :capacity]
+            buffer = grown
+        self._similarity_buffer = buffer
+        self.user_similarity = buffer[:n, :n]
+
+    def _get_neighbors(self, u_idx):
+        """Return (neighbor indices, similarities) for a user row."""
+        if self.user_neighbors is not None:
+            start, end = self.user_neighbors.indptr[u_idx:u_idx + 2]
+            return (
+                self.user_neighbors.indices[start:end],
+                self.user_neighbors.data[start:end],
+            )
+
+        sim_scores = self.user_similarity[u_idx].copy()
+        sim_scores[u_idx] = -np.inf
+        top_users = top_n_indices(sim_scores, self.n_similar_users)
+        top_users = top_users[sim_scores[top_users] > 0]
+        return top_users, sim_scores[top_users]
+
+    def _neighbor_matrix(self, u_idxs):
+        """Sparse (len(u_idxs) × n_users) matrix of neighbor similarities."""
+        if self.user_neighbors is not None:
+            return self.user_neighbors[u_idxs]
+
+        sims = self.user_similarity[u_idxs].copy()
+        sims[np.arange(len(u_idxs)), u_idxs] = -np.inf
+        top = top_n_per_row(sims, self.n_similar_users)
+        values = np.take_along_axis(sims, top, axis=1).ravel()
+        rows = np.repeat(np.arange(len(u_idxs)), top.shape[1])
+        keep = values > 0
+        return csr_matrix(
+            (values[keep], (rows[keep], top.ravel()[keep])),
+            shape=(len(u_idxs), len(self.user_ids))
+        )
+
     def recommend(self, user_id, n=10, exclude_seen=True):
         """Return top-N pin recommendations for a given user."""
         if user_id not in self.user_index:
             return []
 
         u_idx = self.user_index[user_id]
-        sim_scores = self.user_similarity[u_idx]
 
-        # Weight item scores by similarity of top-N similar users
-        top_users = np.argsort(sim_scores)[::-1][1:self.n_similar_users + 1]
-        scores = np.zeros(len(self.pin_ids))
-        for v_idx in top_users:
-            scores += sim_scores[v_idx] * self.user_item_matrix[v_idx].toarray().flatten()
+        # Weight item scores by similarity of top-N similar users:
+        # a single sparse (pins × neighbors) @ (neighbors,) product
+        top_users, sims = self._get_neighbors(u_idx)
+        scores = self.user_item_matrix[top_users].T @ sims
 
         if exclude_seen:
-            seen = self.user_item_matrix[u_idx].toarray().flatten()
-            scores[seen > 0] = 0
+            start, end = self.user_item_matrix.indptr[u_idx:u_idx + 2]
+            scores[self.user_item_matrix.indices[start:end]] = 0
+
+        top_pins = top_n_indices(scores, n)
+        return [self.pin_ids[i] for i in top_pins if scores[i] > 0]
+
+    def recommend_batch(self, user_ids, n=10, exclude_seen=True, block_size=256):
+        """Return top-N recommendations for many users, scoring a block of users at a time."""
+        results = [[] for _ in user_ids]
+        positions, u_idxs = lookup_known(user_ids, self.user_index)
+
+        for start in range(0, len(u_idxs), block_size):
+            block = u_idxs[start:start + block_size]
+            scores = (self._neighbor_matrix(block) @ self.user_item_matrix).toarray()
+
+            if exclude_seen:
+                seen = self.user_item_matrix[block].tocoo()
+                scores[seen.row, seen.col] = 0
 
-        top_pins = np.argsort(scores)[::-1][:n]
-        return [self.pin_ids[i] for i in top_pins if scores[i] > 0]
\ No newline at end of file
+            top = top_n_per_row(scores, n)
+            for pos, row_top, row_scores in zip(positions[start:start + block_size], top, scores):
+                results[pos] = self.pin_ids[row_top[row_scores[row_top] > 0]].tolist()
+        return results
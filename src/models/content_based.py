@@ -1,13 +1,27 @@
 """
 Content-Based Filtering recommender using pin metadata.
 Builds a TF-IDF profile from category, subcategory, and tags,
-then matches pins to user preference profiles.
+then matches pins to user preference profiles. User profiles are the
+weighted user × pin interaction matrix (built once at fit time) times
+the pin TF-IDF vectors.
+
+With vectorizer='hashing', pins are read in chunks and hashed into a fixed
+feature space, so there is no vocabulary to fit: document frequencies are
+accumulated as chunks arrive and new pins can be added with `add_pins`
+without refitting. Memory is bounded by the sparse vectors themselves.
+New pins are weighted with the IDF of the last full re-weight and appended
+in amortized O(new pins); the whole catalog is re-weighted only once the
+pins added since then exceed `reweight_threshold` of its size.
 """
 
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from scipy.sparse import csr_matrix, diags, vstack
+
+from src.utils.helpers import top_n_indices, top_n_per_row, lookup_known, grow_buffer
 
 
 INTERACTION_WEIGHTS = {
@@ -18,58 +32,225 @@ INTERACTION_WEIGHTS = {
     'comment': 1,
 }
 
+CONTENT_COLUMNS = ['category', 'subcategory', 'tags']
+
+
+def _content_strings(pins_df):
+    """Lower-cased 'category subcategory tags' per pin, built column-wise."""
+    content = None
+    for col in CONTENT_COLUMNS:
+        part = pins_df[col].fillna('').astype(str) if col in pins_df else pd.Series('', index=pins_df.index)
+        content = part if content is None else content + ' ' + part
+    return content.str.lower()
+
+
+def _iter_chunks(pins, chunk_size):
+    """Yield DataFrame chunks from a DataFrame or an iterable of DataFrames."""
+    if isinstance(pins, pd.DataFrame):
+        for start in range(0, len(pins), chunk_size):
+            yield pins.iloc[start:start + chunk_size]
+    else:
+        yield from pins
+
+
+class _RowBuffer:
+    """Append-only CSR rows in buffers of doubling capacity; `matrix()` is a zero-copy view."""
+
+    def __init__(self, n_cols):
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self.data = np.empty(0, dtype=np.float64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.indptr = np.zeros(1, dtype=np.int32)
+
+    def append(self, rows):
+        rows = csr_matrix(rows)
+        nnz = self.indptr[self.n_rows]
+        end_nnz, end_rows = nnz + rows.nnz, self.n_rows + rows.shape[0]
+        idx_dtype = np.int64 if end_nnz > np.iinfo(np.int32).max else None
+        self.data = grow_buffer(self.data, end_nnz)
+        self.indices = grow_buffer(self.indices, end_nnz, idx_dtype)
+        self.indptr = grow_buffer(self.indptr, end_rows + 1, idx_dtype)
+        self.data[nnz:end_nnz] = rows.data
+        self.indices[nnz:end_nnz] = rows.indices
+        self.indptr[self.n_rows + 1:end_rows + 1] = rows.indptr[1:] + nnz
+        self.n_rows = end_rows
+
+    def matrix(self):
+        nnz = self.indptr[self.n_rows]
+        return csr_matrix((self.data[:nnz], self.indices[:nnz], self.indptr[:self.n_rows + 1]),
+                          shape=(self.n_rows, self.n_cols), copy=False)
+
 
 class ContentBasedRecommender:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=500, stop_words='english')
+    def __init__(self, vectorizer='tfidf', n_features=2 ** 18, chunk_size=100000, reweight_threshold=0.1):
+        if vectorizer not in ('tfidf', 'hashing'):
+            raise ValueError(f"Unknown vectorizer: {vectorizer!r}")
+        self.chunk_size = chunk_size
+        self.reweight_threshold = reweight_threshold
+        if vectorizer == 'hashing':
+            # Raw term counts; IDF weighting and L2 norm are applied from the running stats
+            self.vectorizer = HashingVectorizer(
+                n_features=n_features, stop_words='english', alternate_sign=False, norm=None
+            )
+        else:
+            self.vectorizer = TfidfVectorizer(max_features=500, stop_words='english')
+        self.streaming = vectorizer == 'hashing'
+        self.term_counts = None
+        self._pending_counts = []
+        self.doc_freq = None
+        self.n_docs = 0
+        self.idf = None
+        self._reweighted_docs = 0
+        self._vector_rows = None
+        self._id_buffer = None
         self.pin_vectors = None
         self.pin_ids = None
         self.pin_index = None
         self.pins_df = None
+        self.user_ids = None
+        self.user_index = None
+        self.user_item_matrix = None
 
     def fit(self, pins_df, interactions_df):
-        """Build TF-IDF vectors from pin content and index user interactions."""
-        self.pins_df = pins_df.copy()
-        self.interactions_df = interactions_df.copy()
-        self.interactions_df['weight'] = (
-            self.interactions_df['interaction_type']
-            .map(INTERACTION_WEIGHTS).fillna(1)
+        """
+        Build TF-IDF vectors from pin content and index user interactions.
+
+        In hashing mode `pins_df` may also be an iterable of DataFrame chunks
+        (e.g. pd.read_csv(..., chunksize=...)); the catalog is not kept.
+        """
+        self._fit_pins(pins_df)
+
+        # Weighted user × pin matrix over interactions with catalog pins
+        df = interactions_df[['user_id', 'pin_id', 'interaction_type']].copy()
+        df['col'] = df['pin_id'].map(self.pin_index)
+        df = df.dropna(subset=['col'])
+        df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
+
+        self.user_ids = df['user_id'].unique()
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self.user_item_matrix = csr_matrix(
+            (df['weight'].values, (df['user_id'].map(self.user_index).values, df['col'].values.astype(int))),
+            shape=(len(self.user_ids), len(self.pin_ids))
         )
+        return self
 
-        # Build content string per pin: category + subcategory + tags
-        def build_content(row):
-            parts = [
-                str(row.get('category', '')),
-                str(row.get('subcategory', '')),
-                str(row.get('tags', '')),
-            ]
-            return ' '.join(parts).lower()
+    def fit_matrix(self, pins_df, user_item_matrix, user_ids, pin_ids):
+        """
+        Fit on pin content plus a prebuilt sparse user × pin weight matrix
+        (e.g. FeatureEngineer's); its columns are re-mapped to catalog order
+        and pins missing from the catalog are dropped.
+        """
+        self._fit_pins(pins_df)
 
-        self.pins_df['content'] = self.pins_df.apply(build_content, axis=1)
-        self.pin_ids = self.pins_df['pin_id'].values
-        self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+        matrix = csr_matrix(user_item_matrix).tocoo()
+        catalog_cols = np.array([self.pin_index.get(p, -1) for p in pin_ids], dtype=np.intp)
+        cols = catalog_cols[matrix.col]
+        keep = cols >= 0
 
-        self.pin_vectors = self.vectorizer.fit_transform(self.pins_df['content'])
+        self.user_ids = np.asarray(user_ids)
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self.user_item_matrix = csr_matrix(
+            (matrix.data[keep].astype(np.float64), (matrix.row[keep], cols[keep])),
+            shape=(len(self.user_ids), len(self.pin_ids))
+        )
         return self
 
+    def _fit_pins(self, pins_df):
+        """Vectorize the pin catalog (TF-IDF, or chunked hashing in streaming mode)."""
+        if self.streaming:
+            self.pins_df = None
+            self._id_buffer = np.empty(0, dtype=object)
+            self.pin_ids = self._id_buffer
+            self.pin_index = {}
+            self.term_counts = None
+            self._pending_counts = []
+            self.doc_freq = np.zeros(self.vectorizer.n_features, dtype=np.int64)
+            self.n_docs = 0
+            for chunk in _iter_chunks(pins_df, self.chunk_size):
+                self._add_chunk(chunk)
+            self.reweight()
+        else:
+            self.pins_df = pins_df.copy()
+            self.pins_df['content'] = _content_strings(self.pins_df)
+            self.pin_ids = self.pins_df['pin_id'].values
+            self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+            self.pin_vectors = self.vectorizer.fit_transform(self.pins_df['content'])
+
+    # ── Streaming (hashing) vectorization ───────────────────────────────────
+
+    def _add_chunk(self, chunk):
+        """Hash one chunk of pins and fold its document frequencies into the running stats."""
+        counts = self.vectorizer.transform(_content_strings(chunk)).tocsr()
+        counts.sum_duplicates()
+        self.doc_freq += np.bincount(counts.indices, minlength=self.vectorizer.n_features)
+        self.n_docs += counts.shape[0]
+        self._pending_counts.append(counts)
+
+        new_ids = chunk['pin_id'].values
+        offset = len(self.pin_ids)
+        self.pin_index.update((p, offset + i) for i, p in enumerate(new_ids))
+        self._id_buffer = grow_buffer(self._id_buffer, offset + len(new_ids))
+        self._id_buffer[offset:offset + len(new_ids)] = new_ids
+        self.pin_ids = self._id_buffer[:offset + len(new_ids)]
+
+    def reweight(self):
+        """
+        Re-weight the whole catalog: TF-IDF pin vectors from raw counts with
+        smoothed IDF, as TfidfVectorizer computes it. O(catalog); add_pins
+        calls it once enough new pins have accumulated.
+        """
+        if self._pending_counts:
+            blocks = [self.term_counts] if self.term_counts is not None else []
+            self.term_counts = vstack(blocks + self._pending_counts, format='csr')
+            self._pending_counts = []
+        self.idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1
+        self._reweighted_docs = self.n_docs
+        self._vector_rows = _RowBuffer(self.vectorizer.n_features)
+        self._vector_rows.append(normalize(self.term_counts @ diags(self.idf)))
+        self.pin_vectors = self._vector_rows.matrix()
+        return self
+
+    def add_pins(self, pins_df):
+        """
+        Vectorize newly arrived pins (hashing mode) without refitting a vocabulary.
+        They are weighted with the current IDF; the catalog is re-weighted once
+        pins added since the last re-weight exceed `reweight_threshold` of it.
+        """
+        if not self.streaming:
+            raise ValueError("add_pins requires vectorizer='hashing'")
+        n_pending = len(self._pending_counts)
+        for chunk in _iter_chunks(pins_df, self.chunk_size):
+            self._add_chunk(chunk)
+
+        if self.n_docs - self._reweighted_docs > self.reweight_threshold * self._reweighted_docs:
+            self.reweight()
+        else:
+            for counts in self._pending_counts[n_pending:]:
+                self._vector_rows.append(normalize(counts @ diags(self.idf)))
+            self.pin_vectors = self._vector_rows.matrix()
+
+        # New pins have no interactions yet; widen the user × pin matrix to cover them
+        self.user_item_matrix = csr_matrix(
+            (self.user_item_matrix.data, self.user_item_matrix.indices, self.user_item_matrix.indptr),
+            shape=(self.user_item_matrix.shape[0], len(self.pin_ids))
+        )
+        return self
+
+    def _get_user_profiles(self, u_idxs):
+        """Weighted-mean TF-IDF profiles for user rows: one sparse product."""
+        weights = self.user_item_matrix[u_idxs]
+        totals = np.asarray(weights.sum(axis=1)).ravel()
+        profiles = weights @ self.pin_vectors
+        return profiles.multiply(1 / np.maximum(totals, 1e-12)[:, None]).tocsr(), totals
+
     def _get_user_profile(self, user_id):
         """Build a weighted TF-IDF profile from a user's interaction history."""
-        user_interactions = self.interactions_df[
-            self.interactions_df['user_id'] == user_id
-        ]
-        if user_interactions.empty:
+        if user_id not in self.user_index:
             return None
 
-        profile = np.zeros(self.pin_vectors.shape[1])
-        total_weight = 0
-        for _, row in user_interactions.iterrows():
-            if row['pin_id'] in self.pin_index:
-                idx = self.pin_index[row['pin_id']]
-                weight = row['weight']
-                profile += weight * self.pin_vectors[idx].toarray().flatten()
-                total_weight += weight
-
-        return profile / total_weight if total_weight > 0 else None
+        profiles, totals = self._get_user_profiles([self.user_index[user_id]])
+        return profiles.toarray().ravel() if totals[0] > 0 else None
 
     def recommend(self, user_id, n=10, exclude_seen=True):
         """Return top-N pins by content similarity to user's preference profile."""
@@ -80,12 +261,32 @@ class ContentBasedRecommender:
         scores = cosine_similarity([profile], self.pin_vectors).flatten()
 
         if exclude_seen:
-            seen_pins = set(
-                self.interactions_df[self.interactions_df['user_id'] == user_id]['pin_id']
-            )
-            for pin_id in seen_pins:
-                if pin_id in self.pin_index:
-                    scores[self.pin_index[pin_id]] = 0
+            u_idx = self.user_index[user_id]
+            start, end = self.user_item_matrix.indptr[u_idx:u_idx + 2]
+            scores[self.user_item_matrix.indices[start:end]] = 0
+
+        top_pins = top_n_indices(scores, n)
+        return [self.pin_ids[i] for i in top_pins]
+
+    def recommend_batch(self, user_ids, n=10, exclude_seen=True, block_size=256):
+        """Return top-N recommendations for many users, scoring a block of users at a time."""
+        results = [[] for _ in user_ids]
+        positions, u_idxs = lookup_known(user_ids, self.user_index)
+
+        for start in range(0, len(u_idxs), block_size):
+            block = u_idxs[start:start + block_size]
+            profiles, totals = self._get_user_profiles(block)
+            has_profile = np.flatnonzero(totals > 0)
+            if len(has_profile) == 0:
+                continue
+
+            scores = cosine_similarity(profiles[has_profile], self.pin_vectors)
+
+            if exclude_seen:
+                seen = self.user_item_matrix[block[has_profile]].tocoo()
+                scores[seen.row, seen.col] = 0
 
-        top_pins = np.argsort(scores)[::-1][:n]
-        return [self.pin_ids[i] for i in top_pins]
\ No newline at end of file
+            top = top_n_per_row(scores, n)
+            for pos, row_top in zip(positions[start:start + block_size][has_profile], top):
+                results[pos] = self.pin_ids[row_top].tolist()
+        return results
@@ -12,31 +12,56 @@ Given the dataset's sparsity (~1.79 interactions/user), evaluation uses two appr
    — This is the honest headline metric for this dataset.
 """
 
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+
 import numpy as np
 import pandas as pd
-from collections import defaultdict
-from sklearn.ensemble import RandomForestClassifier
+from joblib import parallel_config
+from scipy.sparse import csr_matrix
+from threadpoolctl import threadpool_limits
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.model_selection import cross_val_score
 from sklearn.preprocessing import LabelEncoder
 
+from src.utils.cache import ArtifactCache, fingerprint, frame_digest
+
+
+def train_test_split_interactions(interactions_df, test_ratio=0.2, random_state=42, return_indices=False):
+    """
+    Per-user recency split: each user's latest `test_ratio` of interactions
+    go to test, and users with a single interaction stay in train.
+
+    Rows are ordered by (user_id, timestamp) with one stable lexsort, and each
+    row's position within its user's run decides its side, so there is no
+    per-user Python loop. With return_indices=True, returns (train, test)
+    integer row positions into `interactions_df` instead of copying frames.
+    """
+    user_codes, _ = pd.factorize(interactions_df['user_id'], sort=True)
+    timestamps = pd.to_datetime(interactions_df['timestamp'])
+    ts = timestamps.values.view(np.int64).copy()
+    ts[timestamps.isna().values] = np.iinfo(np.int64).max  # NaT sorts last, as in sort_values
 
-def train_test_split_interactions(interactions_df, test_ratio=0.2, random_state=42):
-    interactions_df = interactions_df.copy()
-    interactions_df['timestamp'] = pd.to_datetime(interactions_df['timestamp'])
-    interactions_df = interactions_df.sort_values(['user_id', 'timestamp'])
+    # Users with a missing id are dropped, as groupby drops them
+    order = np.lexsort((ts, user_codes))
+    order = order[user_codes[order] >= 0]
+    codes = user_codes[order]
 
-    train_rows, test_rows = [], []
-    for user_id, group in interactions_df.groupby('user_id'):
-        n = len(group)
-        if n < 2:
-            train_rows.append(group)
-            continue
-        split = max(1, int(n * (1 - test_ratio)))
-        train_rows.append(group.iloc[:split])
-        test_rows.append(group.iloc[split:])
+    sizes = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    position = np.arange(len(order)) - starts[codes]
+    split = np.maximum(1, (sizes * (1 - test_ratio)).astype(int))
+    is_train = position < split[codes]
 
-    train_df = pd.concat(train_rows).reset_index(drop=True)
-    test_df = pd.concat(test_rows).reset_index(drop=True) if test_rows else pd.DataFrame()
+    train_idx, test_idx = order[is_train], order[~is_train]
+    if return_indices:
+        return train_idx, test_idx
+
+    interactions_df = interactions_df.assign(timestamp=timestamps)
+    train_df = interactions_df.iloc[train_idx].reset_index(drop=True)
+    test_df = interactions_df.iloc[test_idx].reset_index(drop=True) if len(test_idx) else pd.DataFrame()
     return train_df, test_df
 
 
@@ -52,42 +77,180 @@ def recall_at_k(recommended, relevant, k):
     return len(set(recommended[:k]) & set(relevant)) / len(relevant)
 
 
-def evaluate_model(model, train_df, test_df, k=10, max_users=200):
-    ground_truth = defaultdict(set)
-    for _, row in test_df.iterrows():
-        ground_truth[row['user_id']].add(row['pin_id'])
+# ── Full-population pin-level evaluation ────────────────────────────────────
+# The fitted model is published in a module global before a fork-started pool
+# is created, so workers share its arrays copy-on-write instead of unpickling
+# a copy; each worker only sends back a small (users × k) array of pin columns.
+
+_eval_state = {}
+
+# With a time budget, chunks are sized to take about 1/TIME_BUDGET_SLICES of it,
+# measured on a first calibration chunk of CALIBRATION_USERS users
+TIME_BUDGET_SLICES = 20
+CALIBRATION_USERS = 32
+
+
+def _recommend_chunk(users):
+    """Top-k recommendations for a chunk of users as pin columns, -1 padded."""
+    model, k, block_size = _eval_state['model'], _eval_state['k'], _eval_state['block_size']
+    pin_col = _eval_state['pin_col']
+    if hasattr(model, 'recommend_batch'):
+        recs = model.recommend_batch(users, n=k, exclude_seen=True, block_size=block_size)
+    else:
+        recs = [model.recommend(u, n=k, exclude_seen=True) for u in users]
+
+    cols = np.full((len(users), k), -1, dtype=np.int64)
+    for row, recommended in enumerate(recs):
+        mapped = [pin_col.get(p, -1) for p in recommended[:k]]
+        cols[row, :len(mapped)] = mapped
+    return cols
+
+
+def ranking_metrics(rec_cols, relevant, k):
+    """
+    Per-user precision/recall/NDCG/AP@k from a (users × k) array of recommended
+    columns (-1 = empty slot) and a binary users × pins CSR of relevant pins.
+    """
+    n_users = rec_cols.shape[0]
+    valid = rec_cols >= 0
+    rows = np.repeat(np.arange(n_users), k)
+    hits = np.zeros(n_users * k, dtype=bool)
+    flat = valid.ravel()
+    hits[flat] = np.asarray(relevant[rows[flat], rec_cols.ravel()[flat]]).ravel() > 0
+    hits = hits.reshape(n_users, k)
+
+    n_relevant = np.diff(relevant.indptr)
+    n_hits = hits.sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+    precision_at_rank = np.cumsum(hits, axis=1) / np.arange(1, k + 1)
+
+    return {
+        'precision': n_hits / k,
+        'recall': n_hits / n_relevant,
+        'ndcg': (hits @ discounts) / ideal,
+        'ap': (precision_at_rank * hits).sum(axis=1) / np.minimum(n_relevant, k),
+    }
+
+
+def evaluate_model(model, train_df, test_df, k=10, max_users=None, block_size=256,
+                   n_jobs=-1, time_budget=None):
+    """
+    Pin-level retrieval metrics over every test user seen in training.
 
-    train_user_set = set(train_df['user_id'].unique())
-    eval_users = [u for u in ground_truth if u in train_user_set]
+    Users are split into chunks scored across a fork-started process pool
+    (n_jobs=-1 uses every core); metrics are computed in vectorized form from
+    the recommended-vs-relevant hit matrix. With `time_budget` (seconds), users
+    are taken in random order and evaluation stops once the budget is spent,
+    so a truncated run is still an unbiased sample. Chunks are then sized from
+    a calibration chunk to a small slice of the budget, and chunks still
+    running at the deadline are abandoned rather than waited for.
+    """
+    train_users = pd.unique(train_df['user_id'])
+    test_df = test_df[test_df['user_id'].isin(train_users)] if len(test_df) else test_df
+    if len(test_df) == 0:
+        return {'precision@k': 0.0, 'recall@k': 0.0, 'ndcg@k': 0.0, 'map@k': 0.0,
+                'coverage': 0.0, 'n_users_evaluated': 0, 'k': k}
 
+    # Relevant pins as a binary users × pins CSR over train ∪ test pins
+    user_rows, eval_users = pd.factorize(test_df['user_id'])
+    pin_ids = pd.unique(pd.concat([train_df['pin_id'], test_df['pin_id']], ignore_index=True))
+    pin_col = {p: i for i, p in enumerate(pin_ids)}
+    relevant = csr_matrix(
+        (np.ones(len(test_df)), (user_rows, test_df['pin_id'].map(pin_col).values)),
+        shape=(len(eval_users), len(pin_ids))
+    )
+    relevant.data[:] = 1
+
+    # Evaluate every user unless a sample size is requested
     rng = np.random.default_rng(42)
-    if len(eval_users) > max_users:
-        eval_users = rng.choice(eval_users, max_users, replace=False).tolist()
+    order = np.arange(len(eval_users))
+    if max_users is not None and len(order) > max_users:
+        order = rng.choice(order, max_users, replace=False)
+    elif time_budget is not None:
+        order = rng.permutation(order)
+    eval_users = np.asarray(eval_users, dtype=object)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    can_fork = 'fork' in multiprocessing.get_all_start_methods()
+    chunk_size = max(block_size, -(-len(order) // (4 * max(1, n_jobs))))
 
-    precisions, recalls, all_recommended = [], [], set()
-    for user_id in eval_users:
-        relevant = ground_truth[user_id]
-        recommended = model.recommend(user_id, n=k, exclude_seen=True)
-        precisions.append(precision_at_k(recommended, relevant, k))
-        recalls.append(recall_at_k(recommended, relevant, k))
-        all_recommended.update(recommended)
+    _eval_state.update(model=model, k=k, block_size=block_size, pin_col=pin_col)
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    done_rows, done_cols = [], []
+    try:
+        if deadline is not None and len(order):
+            calibration, order = order[:CALIBRATION_USERS], order[CALIBRATION_USERS:]
+            start = time.perf_counter()
+            done_rows.append(calibration)
+            done_cols.append(_recommend_chunk(eval_users[calibration].tolist()))
+            per_user = (time.perf_counter() - start) / len(calibration)
+            chunk_size = max(1, min(chunk_size, int(time_budget / TIME_BUDGET_SLICES / max(per_user, 1e-9))))
+            if time.perf_counter() > deadline:
+                order = order[:0]
+        chunks = [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
 
-    all_pins = set(train_df['pin_id'].unique())
-    coverage = len(all_recommended & all_pins) / len(all_pins) if all_pins else 0.0
+        if n_jobs <= 1 or len(chunks) == 1 or not can_fork:
+            for chunk in chunks:
+                done_rows.append(chunk)
+                done_cols.append(_recommend_chunk(eval_users[chunk].tolist()))
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+        else:
+            pool = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('fork'))
+            try:
+                futures = [(chunk, pool.submit(_recommend_chunk, eval_users[chunk].tolist())) for chunk in chunks]
+                for chunk, future in futures:
+                    remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                    try:
+                        cols = future.result(timeout=remaining)
+                    except FuturesTimeout:
+                        break
+                    done_rows.append(chunk)
+                    done_cols.append(cols)
+            finally:
+                # Return at the deadline: drop queued chunks, don't wait for running ones
+                pool.shutdown(wait=False, cancel_futures=True)
+    finally:
+        _eval_state.clear()
+
+    rows = np.concatenate(done_rows) if done_rows else np.empty(0, dtype=np.intp)
+    rec_cols = np.concatenate(done_cols) if done_cols else np.empty((0, k), dtype=np.int64)
+    metrics = ranking_metrics(rec_cols, relevant[rows], k)
+
+    # Coverage: share of training pins recommended to at least one user
+    train_pins = pd.unique(train_df['pin_id'])
+    recommended = np.zeros(len(pin_ids), dtype=bool)
+    recommended[rec_cols[rec_cols >= 0]] = True
+    coverage = recommended[[pin_col[p] for p in train_pins]].mean() if len(train_pins) else 0.0
+
+    def mean(values):
+        return round(float(values.mean()), 4) if len(values) else 0.0
 
     return {
-        'precision@k': round(np.mean(precisions), 4),
-        'recall@k': round(np.mean(recalls), 4),
-        'coverage': round(coverage, 4),
-        'n_users_evaluated': len(eval_users),
+        'precision@k': mean(metrics['precision']),
+        'recall@k': mean(metrics['recall']),
+        'ndcg@k': mean(metrics['ndcg']),
+        'map@k': mean(metrics['ap']),
+        'coverage': round(float(coverage), 4),
+        'n_users_evaluated': len(rows),
         'k': k,
     }
 
 
-def evaluate_category_preference(interactions_df, pins_df, users_df):
+USER_FEATURE_COLUMNS = ['followers_count', 'following_count', 'boards_count', 'pins_count']
+
+CATEGORY_MODELS = {
+    'random_forest': 'RandomForestClassifier(n_estimators=100)',
+    'hist_gradient_boosting': 'HistGradientBoostingClassifier',
+}
+
+
+def category_preference_features(interactions_df, pins_df, users_df):
+    """User × category weighted-affinity features plus profile counts, and each user's top category."""
     WEIGHTS = {'save': 5, 'like': 3, 'click': 2, 'share': 4, 'comment': 1}
 
-    merged = interactions_df.merge(
+    merged = interactions_df[['user_id', 'pin_id', 'interaction_type']].merge(
         pins_df[['pin_id', 'category']], on='pin_id', how='left'
     ).dropna(subset=['category'])
     merged['weight'] = merged['interaction_type'].map(WEIGHTS).fillna(1)
@@ -96,17 +259,54 @@ def evaluate_category_preference(interactions_df, pins_df, users_df):
     categories = user_cat.columns.tolist()
     user_cat['top_category'] = user_cat[categories].idxmax(axis=1)
 
-    user_features = users_df.set_index('user_id')[
-        ['followers_count', 'following_count', 'boards_count', 'pins_count']
-    ]
+    user_features = users_df.set_index('user_id')[USER_FEATURE_COLUMNS]
     X = user_cat[categories].join(user_features, how='inner').fillna(0)
     y = user_cat.loc[X.index, 'top_category']
+    return X, y, categories
+
+
+def evaluate_category_preference(interactions_df, pins_df, users_df, model='random_forest',
+                                 n_jobs=-1, cache_dir='data/processed/cache/'):
+    """
+    5-fold CV accuracy of predicting each user's top category.
+
+    The feature table is cached under a fingerprint of the input columns it
+    reads (cache_dir=None disables caching). Folds run concurrently within a
+    budget of n_jobs cores (-1 = all): up to 5 folds at once, each limited to
+    its share of the remaining cores (random forest jobs, and the OpenMP/BLAS
+    threads of hist gradient boosting).
+    """
+    if model not in CATEGORY_MODELS:
+        raise ValueError(f"Unknown model: {model!r}")
+
+    key = fingerprint(
+        stage='category_preference_features',
+        interactions=frame_digest(interactions_df, ['user_id', 'pin_id', 'interaction_type']),
+        pins=frame_digest(pins_df, ['pin_id', 'category']),
+        users=frame_digest(users_df, ['user_id'] + USER_FEATURE_COLUMNS),
+    )
+    cache = ArtifactCache(cache_dir) if cache_dir is not None else None
+    features = cache.get('category_preference_features', key) if cache is not None else None
+    if features is None:
+        features = category_preference_features(interactions_df, pins_df, users_df)
+        if cache is not None:
+            cache.put('category_preference_features', key, features)
+    X, y, categories = features
 
     le = LabelEncoder()
     y_enc = le.fit_transform(y)
 
-    rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-    scores = cross_val_score(rf, X, y_enc, cv=5, scoring='accuracy')
+    n_jobs = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    fold_jobs = min(5, n_jobs)
+    fold_threads = max(1, n_jobs // fold_jobs)
+    if model == 'hist_gradient_boosting':
+        estimator = HistGradientBoostingClassifier(random_state=42)
+    else:
+        estimator = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=fold_threads)
+
+    # Cap native threads per fold, in fold workers (loky) and in this process (fold_jobs == 1)
+    with parallel_config(backend='loky', inner_max_num_threads=fold_threads), threadpool_limits(fold_threads):
+        scores = cross_val_score(estimator, X, y_enc, cv=5, scoring='accuracy', n_jobs=fold_jobs)
 
     n_categories = len(categories)
     baseline = round(1 / n_categories, 4)
@@ -121,9 +321,9 @@ def evaluate_category_preference(interactions_df, pins_df, users_df):
         'categories': categories,
         'n_users': len(X),
         'cv_folds': 5,
-        'model': 'RandomForestClassifier(n_estimators=100)',
+        'model': CATEGORY_MODELS[model],
         'note': (
             'Primary metric. Predicts user preferred content category '
             'from weighted interaction history. Meaningful despite dataset sparsity.'
         )
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,203 @@
+"""
+Navigable small-world graph index (HNSW) for maximum-inner-product search.
+A pure NumPy/heapq implementation of Malkov & Yashunin's hierarchical graph:
+each vector lives on level 0 and, with geometrically decreasing probability,
+on higher levels that act as express lanes to the right neighborhood. Query
+cost grows roughly logarithmically with the number of indexed vectors.
+
+Scores are raw inner products, which match cosine ranking for the
+L2-normalized item factors of MatrixFactorizationRecommender.
+"""
+
+import heapq
+
+import numpy as np
+
+
+class HNSWIndex:
+    def __init__(self, dim, M=16, ef_construction=100, ef_search=50, random_state=42):
+        self.dim = dim
+        self.M = M
+        self.max_m0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1.0 / np.log(M)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.levels = np.empty(0, dtype=np.int16)
+        self.base_neighbors = np.empty((0, self.max_m0), dtype=np.int32)  # level 0, -1 padded
+        self.upper_neighbors = []  # level l ≥ 1 → {node: neighbor array}
+        self.entry_point = -1
+        self.max_level = -1
+        self._size = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def __len__(self):
+        return self._size
+
+    # ── Graph storage ───────────────────────────────────────────────────────
+
+    def _reserve(self, n_new):
+        """Grow the backing arrays geometrically so inserts stay amortized O(1)."""
+        needed = self._size + n_new
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self.vectors[:self._size]
+        levels = np.zeros(capacity, dtype=np.int16)
+        levels[:self._size] = self.levels[:self._size]
+        base = np.full((capacity, self.max_m0), -1, dtype=np.int32)
+        base[:self._size] = self.base_neighbors[:self._size]
+        self.vectors, self.levels, self.base_neighbors = vectors, levels, base
+
+    def _neighbors(self, node, level):
+        if level == 0:
+            row = self.base_neighbors[node]
+            return row[row >= 0]
+        return self.upper_neighbors[level - 1].get(node, np.empty(0, dtype=np.int32))
+
+    def _set_neighbors(self, node, level, neighbors):
+        neighbors = np.asarray(neighbors, dtype=np.int32)
+        if level == 0:
+            self.base_neighbors[node] = -1
+            self.base_neighbors[node, :len(neighbors)] = neighbors
+        else:
+            self.upper_neighbors[level - 1][node] = neighbors
+
+    # ── Search ──────────────────────────────────────────────────────────────
+
+    def _search_layer(self, query, entry_points, ef, level, visited=None):
+        """Best-first search on one level; returns up to ef (score, node) pairs."""
+        visited = set(entry_points) if visited is None else visited
+        entry_scores = (self.vectors[entry_points] @ query).tolist()
+        candidates = [(-s, e) for s, e in zip(entry_scores, entry_points)]
+        results = [(s, e) for s, e in zip(entry_scores, entry_points)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if -neg_score < results[0][0] and len(results) >= ef:
+                break
+
+            fresh = [n for n in self._neighbors(node, level).tolist() if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+
+            for score, n in zip((self.vectors[fresh] @ query).tolist(), fresh):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, n))
+                    heapq.heappush(results, (score, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return results
+
+    def _descend(self, query, target_level):
+        """Greedy walk from the entry point down to `target_level`."""
+        entry = [self.entry_point]
+        for level in range(self.max_level, target_level, -1):
+            entry = [max(self._search_layer(query, entry, 1, level))[1]]
+        return entry
+
+    def search(self, query, k=10, ef=None, exclude=None):
+        """Return (ids, scores) of approximately the k highest inner products."""
+        if self._size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32)
+        exclude = set() if exclude is None else set(np.asarray(exclude).tolist())
+        ef = max(ef or self.ef_search, k + len(exclude))
+
+        found = self._search_layer(query, self._descend(query, 0), ef, 0)
+        found = heapq.nlargest(k, ((s, n) for s, n in found if n not in exclude))
+        ids = np.array([n for _, n in found], dtype=np.int64)
+        scores = np.array([s for s, _ in found], dtype=np.float32)
+        return ids, scores
+
+    # ── Insertion ───────────────────────────────────────────────────────────
+
+    def add(self, vectors):
+        """Insert vectors; they receive consecutive ids starting at len(self)."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        self._reserve(len(vectors))
+        start = self._size
+        for vector in vectors:
+            self._insert(vector)
+        return np.arange(start, self._size)
+
+    def _insert(self, vector):
+        node = self._size
+        level = int(-np.log(1.0 - self._rng.random()) * self.level_mult)
+        self.vectors[node] = vector
+        self.levels[node] = level
+        self._size += 1
+        while len(self.upper_neighbors) < level:
+            self.upper_neighbors.append({})
+
+        if self.entry_point < 0:
+            self.entry_point, self.max_level = node, level
+            return
+
+        entry = self._descend(vector, level)
+        for lvl in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vector, entry, self.ef_construction, lvl)
+            selected = [n for _, n in heapq.nlargest(self.M, found)]
+            self._set_neighbors(node, lvl, selected)
+
+            # Link back, pruning any neighbor list that overflows to its best entries
+            max_m = self.max_m0 if lvl == 0 else self.M
+            for n in selected:
+                links = np.append(self._neighbors(n, lvl), node)
+                if len(links) > max_m:
+                    scores = self.vectors[links] @ self.vectors[n]
+                    links = links[np.argsort(-scores)[:max_m]]
+                self._set_neighbors(n, lvl, links)
+            entry = [n for _, n in found]
+
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+
+    # ── Persistence ─────────────────────────────────────────────────────────
+
+    def save(self, path):
+        """Write the index to a single .npz file."""
+        upper_nodes, upper_levels, upper_links = [], [], []
+        for level, nodes in enumerate(self.upper_neighbors, start=1):
+            for node, links in nodes.items():
+                padded = np.full(self.M, -1, dtype=np.int32)
+                padded[:len(links)] = links
+                upper_nodes.append(node)
+                upper_levels.append(level)
+                upper_links.append(padded)
+
+        np.savez(
+            path,
+            params=np.array([self.dim, self.M, self.ef_construction, self.ef_search,
+                             self.entry_point, self.max_level]),
+            vectors=self.vectors[:self._size],
+            levels=self.levels[:self._size],
+            base_neighbors=self.base_neighbors[:self._size],
+            upper_nodes=np.array(upper_nodes, dtype=np.int32),
+            upper_levels=np.array(upper_levels, dtype=np.int16),
+            upper_links=np.array(upper_links, dtype=np.int32).reshape(-1, self.M),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by `save`; it can keep accepting inserts."""
+        with np.load(path) as archive:
+            dim, M, ef_construction, ef_search, entry_point, max_level = archive['params'].tolist()
+            index = cls(dim, M=M, ef_construction=ef_construction, ef_search=ef_search)
+            index._size = len(archive['vectors'])
+            index.vectors = archive['vectors']
+            index.levels = archive['levels']
+            index.base_neighbors = archive['base_neighbors']
+            index.entry_point, index.max_level = entry_point, max_level
+            index.upper_neighbors = [{} for _ in range(max(max_level, 0))]
+            for node, level, links in zip(archive['upper_nodes'], archive['upper_levels'], archive['upper_links']):
+                index.upper_neighbors[level - 1][int(node)] = links[links >= 0]
+        return index
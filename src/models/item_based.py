@@ -0,0 +1,119 @@
+"""
+Item-based Collaborative Filtering recommender.
+Precomputes the top-k most similar pins for every pin from the weighted
+user-item matrix, then recommends by aggregating the neighbor lists of a
+user's most recent pins. Serving cost depends on the user's history
+length rather than on the number of users.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from src.models.collaborative_filtering import INTERACTION_WEIGHTS
+from src.models.similarity import top_k_cosine_neighbors
+from src.utils.helpers import top_n_indices, lookup_known
+
+
+class ItemBasedRecommender:
+    def __init__(self, n_similar_pins=20, n_recent=20, block_size=1024):
+        self.n_similar_pins = n_similar_pins
+        self.n_recent = n_recent
+        self.block_size = block_size
+        self.user_item_matrix = None
+        self.user_history = None
+        self.item_neighbors = None
+        self.user_ids = None
+        self.pin_ids = None
+        self.user_index = None
+        self.pin_index = None
+
+    def fit(self, interactions_df):
+        """Build user-item matrix, recent-history matrix and pin neighbor lists."""
+        df = interactions_df.copy()
+        df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
+
+        # Aggregate weights per user-pin pair, remembering the latest touch
+        has_time = 'timestamp' in df.columns
+        if has_time:
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            agg = df.groupby(['user_id', 'pin_id']).agg(
+                weight=('weight', 'sum'), last_seen=('timestamp', 'max')
+            ).reset_index()
+        else:
+            agg = df.groupby(['user_id', 'pin_id'])['weight'].sum().reset_index()
+
+        self.user_ids = agg['user_id'].unique()
+        self.pin_ids = agg['pin_id'].unique()
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+
+        rows = agg['user_id'].map(self.user_index).values
+        cols = agg['pin_id'].map(self.pin_index).values
+        data = agg['weight'].values
+        shape = (len(self.user_ids), len(self.pin_ids))
+
+        self.user_item_matrix = csr_matrix((data, (rows, cols)), shape=shape)
+
+        # Top-k cosine neighbors between pin columns
+        self.item_neighbors = top_k_cosine_neighbors(
+            self.user_item_matrix.T.tocsr(), self.n_similar_pins, block_size=self.block_size
+        )
+
+        # Keep each user's n_recent most recently touched pins as the serving history
+        if has_time:
+            recency = agg.assign(row=rows).sort_values('last_seen', ascending=False)
+            recent = recency.groupby('row').cumcount().values < self.n_recent
+            recent_idx = recency.index.values[recent]
+        else:
+            recent_idx = agg.index.values
+        self.user_history = csr_matrix(
+            (data[recent_idx], (rows[recent_idx], cols[recent_idx])), shape=shape
+        )
+        return self
+
+    def recommend(self, user_id, n=10, exclude_seen=True):
+        """Return top-N pins by aggregating the neighbor lists of the user's recent pins."""
+        if user_id not in self.user_index:
+            return []
+
+        u_idx = self.user_index[user_id]
+        start, end = self.user_history.indptr[u_idx:u_idx + 2]
+        history = self.user_history.indices[start:end]
+        weights = self.user_history.data[start:end]
+
+        # Sum interaction-weighted similarities over the candidate pins only
+        neighbors = self.item_neighbors[history]
+        candidates, inverse = np.unique(neighbors.indices, return_inverse=True)
+        scores = np.bincount(
+            inverse, weights=neighbors.data * np.repeat(weights, np.diff(neighbors.indptr)),
+            minlength=len(candidates)
+        )
+
+        if exclude_seen:
+            start, end = self.user_item_matrix.indptr[u_idx:u_idx + 2]
+            scores[np.isin(candidates, self.user_item_matrix.indices[start:end])] = 0
+
+        top = top_n_indices(scores, n)
+        return [self.pin_ids[candidates[i]] for i in top if scores[i] > 0]
+
+    def recommend_batch(self, user_ids, n=10, exclude_seen=True, block_size=256):
+        """Return top-N recommendations for many users, scoring a block of users at a time."""
+        results = [[] for _ in user_ids]
+        positions, u_idxs = lookup_known(user_ids, self.user_index)
+
+        for start in range(0, len(u_idxs), block_size):
+            block = u_idxs[start:start + block_size]
+            scores = (self.user_history[block] @ self.item_neighbors).tocsr()
+
+            if exclude_seen:
+                seen = self.user_item_matrix[block].astype(bool).astype(scores.dtype)
+                scores = (scores - scores.multiply(seen)).tocsr()
+                scores.eliminate_zeros()
+
+            for pos, row in zip(positions[start:start + block_size], range(len(block))):
+                lo, hi = scores.indptr[row:row + 2]
+                row_scores = scores.data[lo:hi]
+                top = top_n_indices(row_scores, n)
+                results[pos] = self.pin_ids[scores.indices[lo:hi][top[row_scores[top] > 0]]].tolist()
+        return results
@@ -1,15 +1,26 @@
 """
 Matrix Factorization recommender using Truncated SVD.
 Decomposes the user-item interaction matrix into latent factors
-to discover hidden preference patterns.
+to discover hidden preference patterns. Users unseen at fit time can be
+folded in by projecting their interactions through the fitted SVD, and
+per-request retrieval can run against an int8-quantized item store or an
+approximate HNSW graph index.
 """
 
+import time
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
 from sklearn.decomposition import TruncatedSVD
 from sklearn.preprocessing import normalize
+from scipy.linalg import lu
 from scipy.sparse import csr_matrix
 
+from src.models.hnsw import HNSWIndex
+from src.models.quantization import QuantizedItemFactors
+from src.utils.helpers import top_n_indices, top_n_per_row, lookup_known
+
 INTERACTION_WEIGHTS = {
     'save': 5,
     'like': 3,
@@ -19,10 +30,27 @@ INTERACTION_WEIGHTS = {
 }
 
 
+def subspace_drift(basis_a, basis_b, orthonormal=False):
+    """
+    Distance between the column spaces of two (n × k) factor bases, in [0, 1].
+
+    Root-mean-square sine of the principal angles: 0 means the same subspace,
+    1 means orthogonal. Rows must be aligned (same pin order); pass
+    orthonormal=True to skip re-orthonormalizing bases that already are.
+    """
+    q_a, q_b = basis_a, basis_b
+    if not orthonormal:
+        q_a, _ = np.linalg.qr(basis_a)
+        q_b, _ = np.linalg.qr(basis_b)
+    cosines = np.clip(np.linalg.svd(q_a.T @ q_b, compute_uv=False), 0, 1)
+    return float(np.sqrt(np.mean(1 - cosines ** 2)))
+
+
 class MatrixFactorizationRecommender:
-    def __init__(self, n_factors=50, n_iterations=20):
+    def __init__(self, n_factors=50, n_iterations=20, fold_in_cache_size=10000):
         self.n_factors = n_factors
         self.n_iterations = n_iterations
+        self.fold_in_cache_size = fold_in_cache_size
         self.svd = TruncatedSVD(n_components=n_factors, n_iter=n_iterations, random_state=42)
         self.user_factors = None
         self.item_factors = None
@@ -31,6 +59,12 @@ class MatrixFactorizationRecommender:
         self.user_ids = None
         self.pin_ids = None
         self.user_item_matrix = None
+        self.scoring_throughput_ = None
+        self._fold_in_cache = OrderedDict()
+        self.quantized_items = None
+        self.rerank_candidates = 200
+        self.ann_index = None
+        self.refresh_stats_ = None
 
     def fit(self, interactions_df):
         """Fit SVD on weighted user-item matrix."""
@@ -38,43 +72,293 @@ class MatrixFactorizationRecommender:
         df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
         agg = df.groupby(['user_id', 'pin_id'])['weight'].sum().reset_index()
 
-        self.user_ids = agg['user_id'].unique()
-        self.pin_ids = agg['pin_id'].unique()
+        user_ids = agg['user_id'].unique()
+        pin_ids = agg['pin_id'].unique()
+        rows = agg['user_id'].map({u: i for i, u in enumerate(user_ids)})
+        cols = agg['pin_id'].map({p: i for i, p in enumerate(pin_ids)})
+        matrix = csr_matrix(
+            (agg['weight'].values, (rows, cols)),
+            shape=(len(user_ids), len(pin_ids))
+        )
+        return self.fit_matrix(matrix, user_ids, pin_ids)
+
+    def fit_matrix(self, user_item_matrix, user_ids, pin_ids):
+        """Fit SVD on a prebuilt sparse user × pin weight matrix (e.g. FeatureEngineer's)."""
+        self.user_ids = np.asarray(user_ids)
+        self.pin_ids = np.asarray(pin_ids)
         self.user_index = {u: i for i, u in enumerate(self.user_ids)}
         self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+        self.user_item_matrix = csr_matrix(user_item_matrix, dtype=np.float64)
+
+        # Decompose: user_factors @ item_factors.T ≈ user_item_matrix
+        self._set_factors(self.svd.fit_transform(self.user_item_matrix))
+        self.refresh_stats_ = None
+        return self
+
+    def _set_factors(self, user_factors):
+        """Derive serving factors from U·Σ and `svd.components_`; drop stale caches."""
+        self.user_factors = user_factors
+        self.item_factors = self.svd.components_.T  # shape: (n_pins, n_factors)
+
+        # Normalize for stable dot products; float32 halves memory and doubles GEMM speed
+        self.user_factors = normalize(self.user_factors).astype(np.float32)
+        self.item_factors = normalize(self.item_factors).astype(np.float32)
+        self._fold_in_cache = OrderedDict()
+        self.quantized_items = None
+        self.ann_index = None
+
+    def refresh(self, interactions_df, n_iter=2, n_oversamples=10):
+        """
+        Refit on an updated (typically slightly larger) interaction log,
+        warm-starting the randomized SVD from the previous factor subspace.
+
+        Existing users and pins keep their positions and new ones are appended.
+        Instead of `n_iterations` power iterations from a random start, the
+        range finder starts from the previous right singular vectors and runs
+        `n_iter` power iterations. `refresh_stats_` reports the elapsed time,
+        explained variance and how far the item subspace moved; compare
+        against a full refit with `subspace_drift` to decide when to force one.
+        An unfitted model is simply fitted.
+        """
+        if self.user_index is None:
+            return self.fit(interactions_df)
+
+        t0 = time.perf_counter()
+        df = interactions_df.copy()
+        df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
+        agg = df.groupby(['user_id', 'pin_id'])['weight'].sum().reset_index()
+
+        new_users = [u for u in agg['user_id'].unique() if u not in self.user_index]
+        new_pins = [p for p in agg['pin_id'].unique() if p not in self.pin_index]
+        for u in new_users:
+            self.user_index[u] = len(self.user_index)
+        for p in new_pins:
+            self.pin_index[p] = len(self.pin_index)
+        self.user_ids = np.append(np.asarray(self.user_ids, dtype=object), np.array(new_users, dtype=object))
+        self.pin_ids = np.append(np.asarray(self.pin_ids, dtype=object), np.array(new_pins, dtype=object))
 
         rows = agg['user_id'].map(self.user_index)
         cols = agg['pin_id'].map(self.pin_index)
-        data = agg['weight'].values
-
-        self.user_item_matrix = csr_matrix(
-            (data, (rows, cols)),
+        matrix = csr_matrix(
+            (agg['weight'].values, (rows, cols)),
             shape=(len(self.user_ids), len(self.pin_ids))
-        )
+        ).astype(np.float64)
+        self.user_item_matrix = matrix
 
-        # Decompose: user_factors @ item_factors.T ≈ user_item_matrix
-        self.user_factors = self.svd.fit_transform(self.user_item_matrix)
-        self.item_factors = self.svd.components_.T  # shape: (n_pins, n_factors)
+        # Warm start: previous right singular vectors, zero for new pins, plus a
+        # few random columns so directions the old model missed can enter
+        previous = np.zeros((matrix.shape[1], self.n_factors))
+        previous[:self.svd.components_.shape[1]] = self.svd.components_.T
+        rng = np.random.default_rng(42)
+        start = np.hstack([previous, rng.standard_normal((matrix.shape[1], n_oversamples))])
+
+        # Power iterations with cheap LU normalization, one QR at the end
+        Q = matrix @ start
+        for _ in range(n_iter):
+            Q, _ = lu(matrix.T @ Q, permute_l=True)
+            Q, _ = lu(matrix @ Q, permute_l=True)
+        Q, _ = np.linalg.qr(Q)
+        U_b, sigma, Vt = np.linalg.svd((matrix.T @ Q).T, full_matrices=False)
+        U = Q @ U_b[:, :self.n_factors]
+        sigma, Vt = sigma[:self.n_factors], Vt[:self.n_factors]
+
+        # Mirror the attributes TruncatedSVD.fit_transform would have set
+        user_factors = U * sigma
+        total_var = np.asarray(matrix.multiply(matrix).mean(axis=0)).ravel() - \
+            np.asarray(matrix.mean(axis=0)).ravel() ** 2
+        self.svd.components_ = Vt
+        self.svd.singular_values_ = sigma
+        self.svd.explained_variance_ = np.var(user_factors, axis=0)
+        self.svd.explained_variance_ratio_ = self.svd.explained_variance_ / total_var.sum()
+
+        drift = subspace_drift(previous, Vt.T, orthonormal=True)
+        self._set_factors(user_factors)
+        self.refresh_stats_ = {
+            'seconds': round(time.perf_counter() - t0, 3),
+            'new_users': len(new_users),
+            'new_pins': len(new_pins),
+            'explained_variance_ratio': round(self.get_explained_variance(), 4),
+            'subspace_drift_vs_previous': round(drift, 4),
+        }
+        return self
+
+    def build_ann_index(self, M=16, ef_construction=100, ef_search=50):
+        """
+        Index the item factors in an HNSW graph that `recommend` then searches.
 
-        # Normalize for stable dot products
-        self.user_factors = normalize(self.user_factors)
-        self.item_factors = normalize(self.item_factors)
+        Row i of the index is pin_ids[i]; save it with `ann_index.save(path)`
+        and restore it by assigning `HNSWIndex.load(path)` to `ann_index`.
+        """
+        self.ann_index = HNSWIndex(self.n_factors, M=M, ef_construction=ef_construction, ef_search=ef_search)
+        self.ann_index.add(self.item_factors)
         return self
 
+    def add_pins(self, pin_ids, factors):
+        """
+        Append pins unseen at fit time with precomputed latent `factors`
+        (n_new × n_factors), e.g. projected from content features.
+
+        `pin_ids`, `pin_index`, `item_factors` and, when built, the int8 store
+        and HNSW index grow together, so every id `recommend` retrieves maps
+        to a pin. The pins have no interactions, so fold-in ignores them
+        until the next `refresh`.
+        """
+        pin_ids = list(pin_ids)
+        factors = np.atleast_2d(np.asarray(factors, dtype=np.float64))
+        if factors.shape != (len(pin_ids), self.n_factors):
+            raise ValueError(f"Expected factors of shape ({len(pin_ids)}, {self.n_factors}), got {factors.shape}")
+        known = [p for p in pin_ids if p in self.pin_index]
+        if known:
+            raise ValueError(f"Pins already indexed: {known[:5]}")
+        if len(set(pin_ids)) < len(pin_ids):
+            raise ValueError("pin_ids contains duplicates")
+
+        for p in pin_ids:
+            self.pin_index[p] = len(self.pin_index)
+        self.pin_ids = np.append(np.asarray(self.pin_ids, dtype=object), np.array(pin_ids, dtype=object))
+        factors = normalize(factors).astype(np.float32)
+        self.item_factors = np.vstack([self.item_factors, factors])
+        matrix = self.user_item_matrix
+        self.user_item_matrix = csr_matrix((matrix.data, matrix.indices, matrix.indptr),
+                                           shape=(matrix.shape[0], len(self.pin_ids)))
+
+        if self.quantized_items is not None:
+            self.quantized_items = QuantizedItemFactors.from_factors(self.item_factors, exact=self.item_factors)
+        if self.ann_index is not None:
+            self.ann_index.add(factors)
+        return self
+
+    def quantize_item_factors(self, n_candidates=200, exact_path=None):
+        """
+        Serve `recommend` from an int8 item store, re-ranking the top
+        `n_candidates` with exact factors.
+
+        If `exact_path` is given the float32 factors are written there as .npy
+        and reopened memory-mapped, so only the int8 codes stay resident.
+        """
+        if exact_path is not None:
+            np.save(exact_path, self.item_factors)
+            self.item_factors = np.load(exact_path, mmap_mode='r')
+
+        self.quantized_items = QuantizedItemFactors.from_factors(self.item_factors, exact=self.item_factors)
+        self.rerank_candidates = n_candidates
+        return self
+
+    def fold_in(self, user_id, user_interactions):
+        """
+        Project a user unseen at fit time into the latent space without refitting.
+
+        The user's weighted interactions on known pins are multiplied through
+        `svd.components_` (what `svd.transform` would do for one row) and the
+        normalized vector is kept in a bounded LRU cache that `recommend`
+        consults for users missing from `user_index`. `user_interactions` is a
+        DataFrame (or dict of lists) with 'pin_id' and 'interaction_type'.
+        """
+        # A new user's history is short: plain dict lookups beat pandas here
+        cols, weights = [], []
+        for pin_id, interaction_type in zip(user_interactions['pin_id'], user_interactions['interaction_type']):
+            col = self.pin_index.get(pin_id)
+            if col is not None and col < self.svd.components_.shape[1]:
+                cols.append(col)
+                weights.append(INTERACTION_WEIGHTS.get(interaction_type, 1))
+        if not cols:
+            return None
+
+        cols = np.array(cols, dtype=np.intp)
+        vector = self.svd.components_[:, cols] @ np.array(weights, dtype=np.float64)
+        norm = np.linalg.norm(vector)
+        vector = (vector / norm if norm > 0 else vector).astype(np.float32)
+
+        self._fold_in_cache[user_id] = (vector, np.unique(cols))
+        self._fold_in_cache.move_to_end(user_id)
+        while len(self._fold_in_cache) > self.fold_in_cache_size:
+            self._fold_in_cache.popitem(last=False)
+        return vector
+
+    def _get_user_vector(self, user_id):
+        """Return (latent vector, seen pin indices) for a fitted or folded-in user."""
+        if user_id in self.user_index:
+            u_idx = self.user_index[user_id]
+            start, end = self.user_item_matrix.indptr[u_idx:u_idx + 2]
+            return self.user_factors[u_idx], self.user_item_matrix.indices[start:end]
+
+        if user_id in self._fold_in_cache:
+            self._fold_in_cache.move_to_end(user_id)
+            return self._fold_in_cache[user_id]
+        return None, None
+
     def recommend(self, user_id, n=10, exclude_seen=True):
         """Return top-N pin recommendations using latent factor dot products."""
-        if user_id not in self.user_index:
+        vector, seen = self._get_user_vector(user_id)
+        if vector is None:
             return []
 
-        u_idx = self.user_index[user_id]
-        scores = self.user_factors[u_idx] @ self.item_factors.T
+        if self.ann_index is not None:
+            top_pins, _ = self.ann_index.search(vector, k=n, exclude=seen if exclude_seen else None)
+            return [self.pin_ids[i] for i in top_pins]
+
+        if self.quantized_items is not None:
+            top_pins, _ = self.quantized_items.search(
+                vector, n=n, n_candidates=self.rerank_candidates,
+                exclude=seen if exclude_seen else None
+            )
+            return [self.pin_ids[i] for i in top_pins]
+
+        scores = self.item_factors @ vector
+
+        if exclude_seen:
+            scores[seen] = -np.inf
+
+        top_pins = top_n_indices(scores, n)
+        return [self.pin_ids[i] for i in top_pins if np.isfinite(scores[i])]
+
+    def _score_block(self, rows, n, exclude_seen):
+        """Top-n pin indices and scores for a block of user rows (one float32 GEMM)."""
+        scores = self.user_factors[rows] @ self.item_factors.T
 
         if exclude_seen:
-            seen = self.user_item_matrix[u_idx].toarray().flatten()
-            scores[seen > 0] = 0
+            seen = self.user_item_matrix[rows].tocoo()
+            scores[seen.row, seen.col] = -np.inf
+
+        top = top_n_per_row(scores, n)
+        return top, np.take_along_axis(scores, top, axis=1)
+
+    def recommend_batch(self, user_ids, n=10, exclude_seen=True, block_size=256):
+        """Return top-N recommendations for many users, scoring a block of users at a time."""
+        results = [[] for _ in user_ids]
+        positions, u_idxs = lookup_known(user_ids, self.user_index)
+
+        for start in range(0, len(u_idxs), block_size):
+            top, top_scores = self._score_block(u_idxs[start:start + block_size], n, exclude_seen)
+            for pos, row_top, row_scores in zip(positions[start:start + block_size], top, top_scores):
+                results[pos] = self.pin_ids[row_top[np.isfinite(row_scores)]].tolist()
+
+        # Folded-in users are few and already cached; score them one at a time
+        for pos, user_id in enumerate(user_ids):
+            if user_id not in self.user_index and user_id in self._fold_in_cache:
+                results[pos] = self.recommend(user_id, n=n, exclude_seen=exclude_seen)
+        return results
+
+    def recommend_all(self, n=10, exclude_seen=True, block_size=1024):
+        """
+        Top-N pins for every fitted user as a compact (n_users × n) int32 array.
+
+        Rows follow `user_ids`, entries index into `pin_ids`, and -1 pads users
+        with fewer than n unseen pins. Throughput of the run (users/second) is
+        kept in `scoring_throughput_`.
+        """
+        n_users = len(self.user_ids)
+        top_pins = np.full((n_users, min(n, len(self.pin_ids))), -1, dtype=np.int32)
+
+        t0 = time.perf_counter()
+        for start in range(0, n_users, block_size):
+            stop = min(start + block_size, n_users)
+            top, top_scores = self._score_block(slice(start, stop), n, exclude_seen)
+            top_pins[start:stop] = np.where(np.isfinite(top_scores), top, -1)
+        elapsed = time.perf_counter() - t0
 
-        top_pins = np.argsort(scores)[::-1][:n]
-        return [self.pin_ids[i] for i in top_pins]
+        self.scoring_throughput_ = n_users / elapsed if elapsed > 0 else float('inf')
+        return top_pins
 
     def get_explained_variance(self):
         return float(np.sum(self.svd.explained_variance_ratio_))
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Int8-quantized item factor store for latent-factor retrieval.
+Each item row is stored as int8 codes with one float32 scale, so a
+50-factor row takes 54 bytes instead of 200 (float32) or 400 (float64).
+Retrieval scores the whole catalog with integer dot products, then
+re-ranks the top candidates with the exact factors, which can stay on
+disk as a memory-mapped .npy file.
+"""
+
+import numpy as np
+
+from src.utils.helpers import top_n_indices
+
+
+def _quantize_rows(matrix):
+    """Symmetric per-row int8 quantization: matrix ≈ codes * scales[:, None]."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedItemFactors:
+    def __init__(self, codes, scales, exact=None, block_size=4096):
+        self.codes = codes
+        self.scales = scales
+        self.exact = exact
+        self.block_size = block_size
+
+    @classmethod
+    def from_factors(cls, item_factors, exact=None, block_size=4096):
+        """Quantize (n_items × n_factors) factors; `exact` is kept for re-ranking."""
+        codes, scales = _quantize_rows(np.asarray(item_factors, dtype=np.float32))
+        return cls(codes, scales, exact=exact, block_size=block_size)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def approximate_scores(self, query):
+        """Dot product of the query with every item using the int8 codes."""
+        q_codes, q_scale = _quantize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))
+        q_codes = q_codes.ravel().astype(np.float32)
+
+        # Integer products summed in float32 are exact (|sum| ≤ 127² × n_factors < 2²⁴);
+        # converting one block at a time keeps the working set small
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_size):
+            block = self.codes[start:start + self.block_size]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q_codes
+        return scores * self.scales * q_scale[0]
+
+    def search(self, query, n=10, n_candidates=200, exclude=None):
+        """
+        Return (item indices, scores) of the top-n items for a query vector.
+
+        The top `n_candidates` by approximate score are re-ranked with the
+        exact factors when they are available.
+        """
+        scores = self.approximate_scores(query)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+
+        candidates = top_n_indices(scores, max(n, n_candidates))
+        candidates = candidates[np.isfinite(scores[candidates])]
+        if self.exact is None:
+            return candidates[:n], scores[candidates[:n]]
+
+        # Sorted rows read a memory-mapped exact file front to back
+        candidates = np.sort(candidates)
+        exact_scores = np.asarray(self.exact[candidates] @ query)
+        top = top_n_indices(exact_scores, n)
+        return candidates[top], exact_scores[top]
@@ -0,0 +1,36 @@
+"""
+"Related pins" lookup over the sparse top-k pin similarity graph written by
+FeatureEngineer into the feature store ('pin_similarity' plus the
+'pin_feature_ids' id map). Each row holds a pin's k most similar pins, so a
+lookup slices one CSR row: O(k) regardless of catalog size. The graph is
+memory-mapped, so only the rows that are looked up are paged in.
+"""
+
+import numpy as np
+
+from src.data_processing.feature_store import FeatureStore
+
+
+class RelatedPins:
+    def __init__(self, graph, pin_ids):
+        self.graph = graph
+        self.pin_ids = np.asarray(pin_ids, dtype=object)
+        self.pin_index = {p: i for i, p in enumerate(self.pin_ids)}
+
+    @classmethod
+    def load(cls, store_path='data/processed/feature_store', version=None):
+        """Open the similarity graph and its pin id order from a feature store version."""
+        store = FeatureStore(store_path, version)
+        return cls(store.csr('pin_similarity'), store.array('pin_feature_ids'))
+
+    def related(self, pin_id, n=10):
+        """Return up to n (pin_id, similarity) pairs, most similar first."""
+        row = self.pin_index.get(pin_id)
+        if row is None:
+            return []
+
+        start, end = self.graph.indptr[row:row + 2]
+        neighbors = self.graph.indices[start:end]
+        sims = self.graph.data[start:end]
+        order = np.argsort(-sims, kind='stable')[:n]
+        return [(self.pin_ids[j], float(sims[j_pos])) for j, j_pos in zip(neighbors[order], order)]
@@ -0,0 +1,253 @@
+"""
+Sparse nearest-neighbor utilities shared by the recommenders.
+Computes row-wise cosine similarity in blocks of rows and keeps only
+the top-k neighbors of each row, so memory scales with n_rows × k
+instead of n_rows × n_rows.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import row_norms
+
+from src.utils.shared_frames import share_array, attach_array, release
+
+
+def _filter_csr(matrix, keep):
+    """Return a CSR matrix holding only the stored entries where `keep` is True."""
+    indptr = np.concatenate([[0], np.cumsum(keep)])[matrix.indptr]
+    return csr_matrix((matrix.data[keep], matrix.indices[keep], indptr), shape=matrix.shape)
+
+
+# top_k_per_row prunes over-full rows up to this length in padded dense
+# batches of at most PAD_BLOCK_CELLS; per-row argpartition wins beyond it
+PAD_MAX_ROW_LENGTH = 256
+PAD_BLOCK_CELLS = 1 << 22
+
+
+def _mark_top_k(matrix, rows, k, width, keep):
+    """Set `keep` for the k largest entries of each of `rows` (each over k and at most `width` long)."""
+    lengths = np.diff(matrix.indptr)[rows]
+    slot_rows = np.repeat(np.arange(len(rows)), lengths)
+    slots = np.arange(len(slot_rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    padded = np.full((len(rows), width), -np.inf)
+    padded[slot_rows, slots] = matrix.data[matrix.indptr[rows][slot_rows] + slots]
+
+    # Rows hold more than k entries, so the k largest slots are never padding
+    largest = np.argpartition(padded, width - k, axis=1)[:, width - k:]
+    keep[(matrix.indptr[rows][:, None] + largest).ravel()] = True
+
+
+def top_k_per_row(matrix, k):
+    """Keep the k largest stored entries of each row of a sparse matrix."""
+    matrix = csr_matrix(matrix)
+    counts = np.diff(matrix.indptr)
+    crowded = counts > k
+    if not crowded.any():
+        return matrix
+
+    # Short over-full rows are batched by length rounded up to a power of two
+    # and each batch is pruned as one padded dense argpartition
+    keep = ~np.repeat(crowded, counts)
+    short = np.flatnonzero(crowded & (counts <= PAD_MAX_ROW_LENGTH))
+    widths = 1 << np.ceil(np.log2(counts[short])).astype(np.int64)
+    for width in np.unique(widths):
+        rows = short[widths == width]
+        chunk = PAD_BLOCK_CELLS // width
+        for start in range(0, len(rows), chunk):
+            _mark_top_k(matrix, rows[start:start + chunk], k, width, keep)
+
+    # Long rows: argpartition each in place; rows are contiguous in CSR
+    for row in np.flatnonzero(counts > PAD_MAX_ROW_LENGTH):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        keep[start + np.argpartition(matrix.data[start:end], counts[row] - k)[counts[row] - k:]] = True
+    return _filter_csr(matrix, keep)
+
+
+# A row block is scored against column blocks of BLOCK_PAIR_BUDGET // block_size
+# rows at a time and pruned to k in between, so it never holds more than about
+# BLOCK_PAIR_BUDGET candidate pairs however many rows share a column with it
+BLOCK_PAIR_BUDGET = 1 << 23
+
+
+def _column_blocks(normed, width):
+    """[(first row, transposed CSR slice)] over consecutive slices of `width` rows."""
+    return [(start, normed[start:start + width].T.tocsr()) for start in range(0, normed.shape[0], width)]
+
+
+def _block_top_k(normed, column_blocks, start, stop, k, exclude_self):
+    """Top-k neighbors for rows [start, stop) as a (stop - start) × n_rows CSR block."""
+    rows = normed[start:stop]
+    top = csr_matrix((stop - start, normed.shape[0]))
+    for offset, block_t in column_blocks:
+        sims = csr_matrix(rows @ block_t)
+        keep = sims.data > 0
+        if exclude_self:
+            row_ids = np.repeat(np.arange(start, stop), np.diff(sims.indptr))
+            keep &= row_ids != sims.indices + offset
+        sims = top_k_per_row(_filter_csr(sims, keep), k)
+        # Column blocks are disjoint, so adding merges their candidates
+        sims = csr_matrix((sims.data, sims.indices + offset, sims.indptr), shape=top.shape)
+        top = top_k_per_row(top + sims, k)
+    return top
+
+
+# ── Shared-memory process pool ──────────────────────────────────────────────
+# The normalized matrix and its transposed column blocks are copied once into
+# shared memory; workers attach to the segments and wrap them as CSR views
+# without pickling.
+
+_worker_state = {}
+
+
+def _share_csr(matrix, segments):
+    """Copy a CSR matrix's arrays into shared memory; return a picklable spec."""
+    spec = {'shape': matrix.shape}
+    for name in ('data', 'indices', 'indptr'):
+        spec[name] = share_array(getattr(matrix, name), segments)
+    return spec
+
+
+def _attach_csr(spec):
+    segments = _worker_state.setdefault('segments', [])
+    arrays = {name: attach_array(spec[name], segments) for name in ('data', 'indices', 'indptr')}
+    return csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=spec['shape'])
+
+
+def _init_worker(normed_spec, column_specs, k, exclude_self):
+    _worker_state['normed'] = _attach_csr(normed_spec)
+    _worker_state['column_blocks'] = [(offset, _attach_csr(spec)) for offset, spec in column_specs]
+    _worker_state['k'] = k
+    _worker_state['exclude_self'] = exclude_self
+
+
+def _worker_block(bounds):
+    start, stop = bounds
+    block = _block_top_k(
+        _worker_state['normed'], _worker_state['column_blocks'], start, stop,
+        _worker_state['k'], _worker_state['exclude_self']
+    )
+    return start, block.data, block.indices, block.indptr
+
+
+def top_k_cosine_neighbors(matrix, k, block_size=1024, exclude_self=True, n_jobs=1,
+                           pair_budget=BLOCK_PAIR_BUDGET):
+    """
+    Return a CSR graph holding the k most cosine-similar rows of each row.
+
+    Row blocks of the L2-normalized matrix are multiplied against column
+    blocks of its transpose as sparse products, so only pairs that share at
+    least one column are ever materialized, and at most about `pair_budget`
+    of them per row block before pruning to k. With n_jobs > 1 (or -1 for
+    all cores) blocks are computed in a process pool reading the matrix from
+    shared memory.
+    """
+    normed = normalize(csr_matrix(matrix, dtype=np.float64))
+    column_blocks = _column_blocks(normed, max(k + 1, pair_budget // block_size))
+    n_rows = normed.shape[0]
+    bounds = [(start, min(start + block_size, n_rows)) for start in range(0, n_rows, block_size)]
+
+    if not bounds:
+        return csr_matrix((0, 0))
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs <= 1 or len(bounds) == 1:
+        blocks = [_block_top_k(normed, column_blocks, start, stop, k, exclude_self) for start, stop in bounds]
+        return vstack(blocks, format='csr')
+
+    segments = []
+    try:
+        column_specs = [(offset, _share_csr(block_t, segments)) for offset, block_t in column_blocks]
+        init_args = (_share_csr(normed, segments), column_specs, k, exclude_self)
+        blocks = [None] * len(bounds)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=init_args) as pool:
+            for start, data, indices, indptr in pool.map(_worker_block, bounds):
+                stop = min(start + block_size, n_rows)
+                blocks[start // block_size] = csr_matrix(
+                    (data, indices, indptr), shape=(stop - start, n_rows)
+                )
+    finally:
+        release(segments, unlink=True)
+    return vstack(blocks, format='csr')
+
+
+def resize_csr(matrix, shape):
+    """CSR matrix grown to `shape` (extra rows and columns are empty), sharing data and indices."""
+    matrix = csr_matrix(matrix)
+    indptr = np.concatenate([matrix.indptr, np.full(shape[0] - matrix.shape[0], matrix.indptr[-1])])
+    return csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+
+
+def replace_rows(matrix, rows, block):
+    """Return `matrix` with its `rows` replaced by the rows of the CSR `block`, in one pass of array copies."""
+    order = np.arange(matrix.shape[0])
+    order[rows] = matrix.shape[0] + np.arange(len(rows))
+    return vstack([matrix, block], format='csr')[order]
+
+
+def cosine_rows(matrix, rows, norms):
+    """
+    Cosine similarities of `rows` to every row of `matrix`, as a sparse
+    len(rows) × n_rows matrix. Dot products are scaled by the cached row
+    `norms`, so the matrix itself is never normalized.
+    """
+    sims = (matrix @ matrix[rows].T).T.tocsr()
+    scale = norms[rows][np.repeat(np.arange(len(rows)), np.diff(sims.indptr))] * norms[sims.indices]
+    # A stored product implies both rows are non-zero, so scale is positive
+    sims.data /= scale
+    return sims
+
+
+def update_top_k_cosine_neighbors(graph, matrix, touched, k, norms=None):
+    """
+    Refresh a top-k cosine graph after the rows in `touched` changed.
+
+    Only rows whose lists can change are rebuilt: the touched rows, and the
+    rows that had an edge to a touched row, are not yet full, or now have a
+    similarity to one above their k-th. Their edges to touched rows are
+    replaced by the new similarities before re-pruning to k; weights only
+    ever grow, so every row with such an edge has a new similarity. Dot
+    products are scaled by `norms` (cached row norms) when given. A row that
+    loses a touched neighbor does not recover a candidate pruned earlier, so
+    an occasional full rebuild keeps the graph exact.
+    """
+    n_rows = matrix.shape[0]
+    touched = np.unique(touched)
+    norms = row_norms(matrix) if norms is None else norms
+
+    sims = cosine_rows(matrix, touched, norms).tocoo()
+    keep = (sims.data > 0) & (touched[sims.row] != sims.col)
+    t_rows, cols, values = touched[sims.row[keep]], sims.col[keep], sims.data[keep]
+
+    # The graph may have grown; only rows with a new similarity are read
+    graph = resize_csr(graph, (n_rows, n_rows))
+    is_touched = np.zeros(n_rows, dtype=bool)
+    is_touched[touched] = True
+    reverse = ~is_touched[cols]
+    candidates, slots = np.unique(cols[reverse], return_inverse=True)
+    old = graph[candidates]
+    counts = np.diff(old.indptr)
+    old_rows = np.repeat(np.arange(len(candidates)), counts)
+    stale = is_touched[old.indices]
+
+    kth = np.full(len(candidates), -np.inf)
+    full = counts >= k
+    if full.any():
+        kth[full] = np.minimum.reduceat(old.data, old.indptr[:-1][full])
+    best = np.zeros(len(candidates))
+    np.maximum.at(best, slots, values[reverse])
+    changed = (np.bincount(old_rows[stale], minlength=len(candidates)) > 0) | (best > kth)
+
+    # Fresh edges: touched rows' own lists, plus reverse edges for changed rows
+    kept = changed[old_rows] & ~stale
+    reverse[reverse] = changed[slots]
+    affected = np.union1d(touched, candidates[changed])
+    rows = np.concatenate([candidates[old_rows[kept]], t_rows, cols[reverse]])
+    cols_all = np.concatenate([old.indices[kept], cols, t_rows[reverse]])
+    data = np.concatenate([old.data[kept], values, values[reverse]])
+
+    block = csr_matrix((data, (np.searchsorted(affected, rows), cols_all)), shape=(len(affected), n_rows))
+    return replace_rows(graph, affected, top_k_per_row(block, k))
@@ -0,0 +1,83 @@
+"""
+Content-addressed artifact cache for pipeline stages.
+A stage's fingerprint hashes everything its output depends on (input file
+contents, parameters, the stage function's source, upstream fingerprints);
+a cached artifact is reused only when the fingerprint matches, so stale
+results are never served.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+import pandas as pd
+
+# Bump when code a stage calls into changes (its own source is fingerprinted)
+# so older artifacts stop matching
+CACHE_VERSION = 1
+
+_file_digests = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, memoized per (path, size, mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+def frame_digest(df, columns=None):
+    """SHA-256 of a DataFrame's values (optionally a column subset), independent of its index."""
+    df = df if columns is None else df[columns]
+    digest = hashlib.sha256(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def source_digest(func):
+    """SHA-256 of a function's source, so editing a stage invalidates its artifacts."""
+    return hashlib.sha256(inspect.getsource(func).encode()).hexdigest()
+
+
+def fingerprint(**parts):
+    """Stable hash of JSON-serializable parts (file digests, parameters, upstream fingerprints)."""
+    payload = json.dumps({'cache_version': CACHE_VERSION, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name, key):
+        return os.path.join(self.directory, f'{name}-{key[:16]}.pkl')
+
+    def get(self, name, key):
+        """Return the artifact stored for (name, key), or None."""
+        path = self._path(name, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def put(self, name, key, value):
+        """Store an artifact atomically and drop older artifacts of the same name."""
+        path = self._path(name, key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        for entry in os.listdir(self.directory):
+            if entry.startswith(f'{name}-') and entry.endswith('.pkl') and entry != os.path.basename(path):
+                os.remove(os.path.join(self.directory, entry))
+        return value
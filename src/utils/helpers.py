@@ -0,0 +1,44 @@
+"""
+Small numeric helpers shared across the recommenders.
+"""
+
+import numpy as np
+
+
+def top_n_indices(scores, n):
+    """Indices of the n largest scores, highest first, without a full sort."""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.array([], dtype=np.intp)
+    top = np.argpartition(-scores, n - 1)[:n]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def top_n_per_row(scores, n):
+    """Column indices of the n largest scores in each row, highest first."""
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+def grow_buffer(array, size, dtype=None):
+    """Return `array`, or a copy with room for at least `size` rows, doubling its capacity."""
+    if size <= len(array) and dtype in (None, array.dtype):
+        return array
+    grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=dtype or array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def lookup_known(ids, index):
+    """Split ids into (positions, row indices) for those present in an id→row index."""
+    positions, rows = [], []
+    for pos, key in enumerate(ids):
+        row = index.get(key)
+        if row is not None:
+            positions.append(pos)
+            rows.append(row)
+    return np.array(positions, dtype=np.intp), np.array(rows, dtype=np.intp)
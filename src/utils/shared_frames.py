@@ -0,0 +1,89 @@
+"""
+Arrays and DataFrames in POSIX shared memory for process pools.
+share_array/attach_array move a single array (the sparse similarity pool
+shares CSR matrices through them); share_frame stores each column as a flat
+NumPy array in its own segment: string columns as integer codes plus a
+fixed-width unicode vocabulary, numbers and (tz-naive) datetimes as-is.
+Workers receive only a small picklable spec, attach to the segments and
+rebuild the frame without the parent pickling the data to each of them.
+
+This saves the transfer, not the memory: attach_frame decodes string columns
+into private object arrays and pandas copies every column, so each worker
+holds its own copy of what it rebuilds. Pass `columns` and `rows` to decode
+only the part a worker uses; the encoded data stays shared and attach_array
+views of it are never copied.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+def share_array(array, segments):
+    """Copy an array into shared memory; returns a picklable spec for attach_array."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    segments.append(shm)
+    return shm.name, array.shape, array.dtype.str
+
+
+def attach_array(spec, segments):
+    """View of a shared array; keep its segment open (see release) while the view is used."""
+    name, shape, dtype = spec
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers with the shared resource tracker; the owner's unlink() clears it
+        shm = shared_memory.SharedMemory(name=name)
+    segments.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def share_frame(df, segments):
+    """Copy a DataFrame's columns into shared memory; returns a picklable spec."""
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+                or isinstance(values.dtype, np.dtype) and values.dtype.kind == 'M'):
+            columns.append((col, 'values', share_array(values.to_numpy(), segments)))
+        else:
+            codes, uniques = pd.factorize(values)
+            vocab = np.asarray(uniques, dtype=object).astype(str)
+            columns.append((col, 'codes', (share_array(codes.astype(np.int32), segments),
+                                           share_array(vocab, segments))))
+    return {'n_rows': len(df), 'columns': columns}
+
+
+def attach_frame(spec, segments, rows=None, columns=None):
+    """
+    Rebuild a DataFrame from a share_frame spec, optionally only `rows` and
+    `columns` (decoding nothing else). The frame owns its data (pandas copies
+    dict input), so the segments can be released right after.
+    """
+    data = {}
+    for col, kind, arrays in spec['columns']:
+        if columns is not None and col not in columns:
+            continue
+        if kind == 'codes':
+            codes, vocab = (attach_array(a, segments) for a in arrays)
+            codes = codes if rows is None else codes[rows]
+            decoded = vocab.astype(object)[codes]
+            decoded[codes < 0] = None
+            data[col] = decoded
+        else:
+            values = attach_array(arrays, segments)
+            values = values if rows is None else values[rows]
+            data[col] = values
+    return pd.DataFrame(data)
+
+
+def release(segments, unlink=False):
+    """Close attached segments; the creating process also unlinks them."""
+    for shm in segments:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    segments.clear()
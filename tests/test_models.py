@@ -0,0 +1,316 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.data_processing.feature_engineering import FeatureEngineer, INTERACTION_WEIGHTS as FE_WEIGHTS
+from src.models.collaborative_filtering import CollaborativeFilteringRecommender
+from src.models.content_based import ContentBasedRecommender, INTERACTION_WEIGHTS
+from src.models.evaluate_models import (
+    train_test_split_interactions, evaluate_model, precision_at_k, recall_at_k, CALIBRATION_USERS
+)
+from src.models.lsh import lsh_cosine_neighbors, neighbor_recall
+from src.models.matrix_factorization import MatrixFactorizationRecommender
+from src.models.similarity import top_k_cosine_neighbors
+
+
+def make_interactions(n_users, n_pins, n_interactions, seed=0):
+    """Random interaction log; 'view' has no weight and falls back to 1."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'user_id': [f'u{i}' for i in rng.integers(0, n_users, n_interactions)],
+        'pin_id': [f'p{i}' for i in rng.integers(0, n_pins, n_interactions)],
+        'interaction_type': rng.choice(['save', 'like', 'click', 'share', 'comment', 'view'], n_interactions),
+        'timestamp': pd.Timestamp('2025-01-01')
+                     + pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, n_interactions), unit='s'),
+    })
+
+
+@pytest.mark.parametrize('pair_budget, n_jobs', [(1 << 23, 1), (200, 1), (200, 2)])
+def test_top_k_neighbors_match_dense_cosine(pair_budget, n_jobs):
+    # A small pair budget splits every row block into several column blocks
+    matrix = CollaborativeFilteringRecommender().fit(make_interactions(120, 60, 600, seed=9)).user_item_matrix
+    k = 5
+    graph = top_k_cosine_neighbors(matrix, k, block_size=16, n_jobs=n_jobs, pair_budget=pair_budget)
+
+    dense = cosine_similarity(matrix)
+    np.fill_diagonal(dense, 0)
+    for row in range(matrix.shape[0]):
+        expected = np.sort(dense[row][dense[row] > 0])[::-1][:k]
+        got = np.sort(graph.data[graph.indptr[row]:graph.indptr[row + 1]])[::-1]
+        np.testing.assert_allclose(got, expected, atol=1e-12)
+
+
+def test_lsh_covering_every_bucket_is_exact():
+    # Buckets as large as the data give one sign bit, and one probe visits the other bucket
+    matrix = CollaborativeFilteringRecommender().fit(make_interactions(150, 80, 700, seed=10)).user_item_matrix
+    exact = top_k_cosine_neighbors(matrix, 5)
+    approx = lsh_cosine_neighbors(matrix, 5, n_tables=1, n_probes=1, bucket_size=matrix.shape[0])
+    assert neighbor_recall(approx, exact) == 1.0
+
+
+def _fit_incrementally(similarity):
+    """Fit on a base log, fold in a batch with new users and pins, and refit on both for reference."""
+    base = make_interactions(50, 80, 400, seed=0)
+    update = make_interactions(60, 100, 60, seed=1)
+    model = CollaborativeFilteringRecommender(n_similar_users=5, similarity=similarity, block_size=16)
+    model.fit(base).partial_fit(update)
+    reference = CollaborativeFilteringRecommender(n_similar_users=5, similarity=similarity, block_size=16)
+    reference.fit(pd.concat([base, update], ignore_index=True))
+    return model, reference, update
+
+
+def test_partial_fit_matches_refit_matrix():
+    model, reference, _ = _fit_incrementally('dense')
+    users = [model.user_index[u] for u in reference.user_ids]
+    pins = [model.pin_index[p] for p in reference.pin_ids]
+    np.testing.assert_allclose(model.user_item_matrix[users][:, pins].toarray(),
+                               reference.user_item_matrix.toarray())
+
+
+def test_partial_fit_matches_refit_dense_similarity():
+    model, reference, _ = _fit_incrementally('dense')
+    users = [model.user_index[u] for u in reference.user_ids]
+    np.testing.assert_allclose(model.user_similarity[np.ix_(users, users)], reference.user_similarity,
+                               atol=1e-12)
+
+
+def test_partial_fit_matches_refit_topk_touched_rows():
+    model, reference, update = _fit_incrementally('topk')
+    for user_id in update['user_id'].unique():
+        row, ref_row = model.user_index[user_id], reference.user_index[user_id]
+        got = model.user_neighbors[row]
+        expected = reference.user_neighbors[ref_row]
+        # Compare similarity values, so ties at the k-th place may pick either neighbor
+        np.testing.assert_allclose(np.sort(got.data), np.sort(expected.data), atol=1e-12)
+        # Neighbors strictly above the k-th similarity must be the same users
+        if len(expected.data):
+            cut = expected.data.min() + 1e-9
+            assert (set(model.user_ids[got.indices[got.data > cut]])
+                    == set(reference.user_ids[expected.indices[expected.data > cut]]))
+
+
+def test_partial_fit_in_small_batches_matches_refit():
+    # One batch per event grows the id and similarity buffers several times; a
+    # pickle round trip drops the spare capacity halfway through
+    base = make_interactions(10, 30, 40, seed=7)
+    stream = make_interactions(40, 50, 60, seed=8)
+    model = CollaborativeFilteringRecommender(similarity='dense').fit(base)
+    for i in range(len(stream)):
+        if i == len(stream) // 2:
+            model = pickle.loads(pickle.dumps(model))
+        model.partial_fit(stream.iloc[i:i + 1])
+
+    reference = CollaborativeFilteringRecommender(similarity='dense').fit(pd.concat([base, stream]))
+    users = [model.user_index[u] for u in reference.user_ids]
+    assert list(model.user_ids[users]) == list(reference.user_ids)
+    np.testing.assert_allclose(model.user_similarity[np.ix_(users, users)], reference.user_similarity,
+                               atol=1e-12)
+
+
+def test_partial_fit_on_unfitted_model_fits():
+    interactions = make_interactions(20, 30, 100)
+    model = CollaborativeFilteringRecommender(similarity='dense').partial_fit(interactions)
+    reference = CollaborativeFilteringRecommender(similarity='dense').fit(interactions)
+    np.testing.assert_allclose(model.user_similarity, reference.user_similarity)
+
+
+def _groupby_split(interactions_df, test_ratio=0.2):
+    """The per-user groupby loop the vectorized split replaced."""
+    df = interactions_df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values(['user_id', 'timestamp'])
+
+    train_parts, test_parts = [], []
+    for _, group in df.groupby('user_id'):
+        n = len(group)
+        if n < 2:
+            train_parts.append(group)
+            continue
+        split = max(1, int(n * (1 - test_ratio)))
+        train_parts.append(group.iloc[:split])
+        test_parts.append(group.iloc[split:])
+
+    train_df = pd.concat(train_parts).reset_index(drop=True)
+    test_df = pd.concat(test_parts).reset_index(drop=True) if test_parts else pd.DataFrame()
+    return train_df, test_df
+
+
+def _split_cases():
+    plain = make_interactions(40, 60, 300, seed=2)
+
+    # Timestamps as strings with gaps (NaT), duplicate times and a missing user id
+    messy = make_interactions(30, 50, 200, seed=3)
+    messy['timestamp'] = messy['timestamp'].dt.floor('D').astype(str).astype(object)
+    messy.loc[messy.index[::7], 'timestamp'] = None
+    messy.loc[messy.index[::11], 'user_id'] = None
+
+    singles = make_interactions(10, 20, 10, seed=4).drop_duplicates('user_id')
+    return {'plain': plain, 'messy': messy, 'singles': singles}
+
+
+@pytest.mark.parametrize('case', ['plain', 'messy', 'singles'])
+@pytest.mark.parametrize('test_ratio', [0.2, 0.5])
+def test_split_matches_groupby_loop(case, test_ratio):
+    interactions = _split_cases()[case]
+    train_df, test_df = train_test_split_interactions(interactions, test_ratio=test_ratio)
+    expected_train, expected_test = _groupby_split(interactions, test_ratio=test_ratio)
+    pd.testing.assert_frame_equal(train_df, expected_train)
+    pd.testing.assert_frame_equal(test_df, expected_test)
+
+
+def test_split_indices_match_frames():
+    interactions = _split_cases()['messy']
+    train_idx, test_idx = train_test_split_interactions(interactions, return_indices=True)
+    train_df, test_df = train_test_split_interactions(interactions)
+    assert (interactions['pin_id'].values[train_idx] == train_df['pin_id'].values).all()
+    assert (interactions['pin_id'].values[test_idx] == test_df['pin_id'].values).all()
+
+
+def _loop_metrics(model, train_df, test_df, users, k):
+    """The per-user precision/recall/coverage loop evaluate_model replaced."""
+    ground_truth = test_df.groupby('user_id')['pin_id'].agg(set)
+    precisions, recalls, all_recommended = [], [], set()
+    for user_id, recommended in zip(users, model.recommend_batch(users, n=k)):
+        precisions.append(precision_at_k(recommended, ground_truth[user_id], k))
+        recalls.append(recall_at_k(recommended, ground_truth[user_id], k))
+        all_recommended.update(recommended)
+    all_pins = set(train_df['pin_id'])
+    return {
+        'precision@k': round(np.mean(precisions), 4),
+        'recall@k': round(np.mean(recalls), 4),
+        'coverage': round(len(all_recommended & all_pins) / len(all_pins), 4),
+        'n_users_evaluated': len(users),
+    }
+
+
+def _evaluation_case():
+    train_df, test_df = train_test_split_interactions(make_interactions(120, 300, 1500, seed=13))
+    model = CollaborativeFilteringRecommender(n_similar_users=10).fit(train_df)
+    eval_users = pd.unique(test_df['user_id'][test_df['user_id'].isin(train_df['user_id'])])
+    return model, train_df, test_df, eval_users
+
+
+@pytest.mark.parametrize('n_jobs, time_budget', [(1, None), (2, None), (1, 600), (2, 600)])
+def test_evaluate_model_matches_per_user_loop(n_jobs, time_budget):
+    # A generous budget still evaluates every user, in random order
+    model, train_df, test_df, eval_users = _evaluation_case()
+    metrics = evaluate_model(model, train_df, test_df, k=5, block_size=16, n_jobs=n_jobs, time_budget=time_budget)
+    expected = _loop_metrics(model, train_df, test_df, list(eval_users), k=5)
+    assert {key: metrics[key] for key in expected} == expected
+
+
+def test_evaluate_model_time_budget_samples_calibration_users():
+    # A spent budget stops after the calibration chunk: the first users of the seeded permutation
+    model, train_df, test_df, eval_users = _evaluation_case()
+    metrics = evaluate_model(model, train_df, test_df, k=5, n_jobs=1, time_budget=1e-9)
+    sampled = eval_users[np.random.default_rng(42).permutation(len(eval_users))[:CALIBRATION_USERS]]
+    expected = _loop_metrics(model, train_df, test_df, list(sampled), k=5)
+    assert CALIBRATION_USERS < len(eval_users)
+    assert {key: metrics[key] for key in expected} == expected
+
+
+def make_pins(n_pins, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = rng.choice(['food', 'travel', 'fashion', 'diy'], n_pins)
+    return pd.DataFrame({
+        'pin_id': [f'p{i}' for i in range(n_pins)],
+        'category': categories,
+        'subcategory': [f'{c} sub{j}' for c, j in zip(categories, rng.integers(0, 3, n_pins))],
+        'tags': [' '.join(f'tag{t}' for t in rng.integers(0, 25, 3)) for _ in range(n_pins)],
+    })
+
+
+def _iterrows_profile(model, interactions_df, user_id):
+    """The per-interaction profile loop the fit-time weight matrix replaced."""
+    df = interactions_df.copy()
+    df['weight'] = df['interaction_type'].map(INTERACTION_WEIGHTS).fillna(1)
+    user_interactions = df[df['user_id'] == user_id]
+    if user_interactions.empty:
+        return None
+
+    profile = np.zeros(model.pin_vectors.shape[1])
+    total_weight = 0
+    for _, row in user_interactions.iterrows():
+        if row['pin_id'] in model.pin_index:
+            idx = model.pin_index[row['pin_id']]
+            weight = row['weight']
+            profile += weight * model.pin_vectors[idx].toarray().flatten()
+            total_weight += weight
+    return profile / total_weight if total_weight > 0 else None
+
+
+@pytest.mark.parametrize('vectorizer', ['tfidf', 'hashing'])
+def test_content_profiles_match_iterrows_loop(vectorizer):
+    pins = make_pins(60)
+    # Pins p60..p79 are outside the catalog; u_gone only touched those
+    interactions = make_interactions(25, 80, 300, seed=5)
+    interactions = pd.concat([interactions, pd.DataFrame({
+        'user_id': ['u_gone', 'u_gone'], 'pin_id': ['p70', 'p75'],
+        'interaction_type': ['save', 'like'], 'timestamp': pd.Timestamp('2025-02-01'),
+    })], ignore_index=True)
+
+    model = ContentBasedRecommender(vectorizer=vectorizer, n_features=2 ** 12).fit(pins, interactions)
+    for user_id in list(interactions['user_id'].unique()) + ['u_unknown']:
+        profile = model._get_user_profile(user_id)
+        expected = _iterrows_profile(model, interactions, user_id)
+        if expected is None:
+            assert profile is None
+        else:
+            np.testing.assert_allclose(profile, expected, atol=1e-12)
+
+
+def _pivot_user_item_matrix(interactions_df):
+    """The dense pivot_table the sparse user-item matrix replaced."""
+    df = interactions_df.copy()
+    df['weight'] = df['interaction_type'].map(FE_WEIGHTS)
+    return df.pivot_table(index='user_id', columns='pin_id', values='weight', fill_value=0).astype(np.float32)
+
+
+def test_user_item_matrix_matches_pivot_table():
+    # Repeated pairs (mean weight), unweighted 'view' rows and missing ids in both columns
+    interactions = make_interactions(30, 40, 400, seed=6)
+    interactions.loc[interactions.index[::13], 'user_id'] = None
+    interactions.loc[interactions.index[5::17], 'pin_id'] = np.nan
+
+    engineer = FeatureEngineer()
+    engineer.interactions_df = interactions
+    result = engineer.create_user_item_matrix()
+    expected = _pivot_user_item_matrix(interactions)
+
+    assert list(result['user_ids']) == list(expected.index)
+    assert list(result['pin_ids']) == list(expected.columns)
+    np.testing.assert_allclose(result['matrix'].toarray(), expected.values)
+
+
+def test_refresh_on_unfitted_model_fits():
+    interactions = make_interactions(30, 40, 300, seed=12)
+    model = MatrixFactorizationRecommender(n_factors=8).refresh(interactions)
+    reference = MatrixFactorizationRecommender(n_factors=8).fit(interactions)
+    np.testing.assert_allclose(model.item_factors, reference.item_factors)
+    assert model.refresh_stats_ is None
+
+
+@pytest.mark.parametrize('store', ['exact', 'quantized', 'hnsw'])
+def test_add_pins_extends_every_store(store):
+    model = MatrixFactorizationRecommender(n_factors=8).fit(make_interactions(40, 60, 500, seed=11))
+    if store == 'quantized':
+        model.quantize_item_factors(n_candidates=50)
+    elif store == 'hnsw':
+        model.build_ann_index(M=8, ef_search=100)
+
+    # New pins pointing straight at a user rank first for that user
+    user_id, n_pins = model.user_ids[0], len(model.pin_ids)
+    new_pins = ['p_new0', 'p_new1']
+    model.add_pins(new_pins, np.vstack([model.user_factors[0], 2 * model.user_factors[0]]))
+
+    assert len(model.pin_ids) == len(model.pin_index) == len(model.item_factors)
+    assert set(model.recommend(user_id, n=2)) == set(new_pins)
+    assert sorted(model.recommend_all(n=2)[0]) == [n_pins, n_pins + 1]
+    # Fold-in skips the new pins, which have no SVD components yet
+    history = {'pin_id': ['p_new0', model.pin_ids[1]], 'interaction_type': ['save', 'like']}
+    assert model.fold_in('u_folded', history) is not None
+    with pytest.raises(ValueError):
+        model.add_pins(['p_new0'], model.user_factors[:1])